@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import json
-from pathlib import Path
+from app.core.executor import run_blocking
+from app.core.rules import invalidate_rules
+from app.core.settings import config_cache, library_cache, JsonFileError
 
 router = APIRouter(
     prefix="/config",
@@ -13,23 +14,52 @@ router = APIRouter(
 class ConfigUpdate(BaseModel):
     """配置更新请求模型"""
     scan_timeout: Optional[int] = None
+    fetch_retries: Optional[int] = None
+    circuit_breaker_threshold: Optional[int] = None
+    circuit_breaker_cooldown: Optional[float] = None
     concurrent_scans: Optional[int] = None
+    embedded_workers: Optional[bool] = None
+    job_lease_seconds: Optional[int] = None
+    max_scans_per_host: Optional[int] = None
+    max_pages: Optional[int] = None
+    max_query_variants: Optional[int] = None
+    scope_include: Optional[List[str]] = None
+    scope_exclude: Optional[List[str]] = None
+    ignored_query_params: Optional[List[str]] = None
+    html_parser: Optional[str] = None
+    probe_rate_limit: Optional[float] = None
+    probe_max_in_flight: Optional[int] = None
+    probe_budget_per_origin: Optional[int] = None
+    analysis_workers: Optional[int] = None
+    connection_limit: Optional[int] = None
+    connection_limit_per_host: Optional[int] = None
+    dns_cache_ttl: Optional[int] = None
+    keepalive_timeout: Optional[float] = None
+    max_response_bytes: Optional[int] = None
+    fetch_content_types: Optional[List[str]] = None
+    response_cache: Optional[bool] = None
+    response_cache_ttl: Optional[int] = None
+    response_cache_max_bytes: Optional[int] = None
     user_agent: Optional[str] = None
     default_scan_modules: Optional[List[str]] = None
     custom_settings: Optional[Dict[str, Any]] = None
 
+async def read_json_file(read, *args):
+    """在线程池中读取配置或漏洞库，文件为空或格式无效时返回500"""
+    try:
+        return await run_blocking(read, *args)
+    except JsonFileError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/")
 async def get_config():
     """
     获取当前配置
     """
-    config_file = Path("data/config.json")
-    if not config_file.exists():
+    config = await read_json_file(config_cache.get)
+    if config is None:
         raise HTTPException(status_code=404, detail="配置文件不存在")
     
-    with open(config_file, "r") as f:
-        config = json.load(f)
-    
     return config
 
 @router.patch("/")
@@ -37,21 +67,17 @@ async def update_config(config_update: ConfigUpdate):
     """
     更新配置
     """
-    config_file = Path("data/config.json")
-    if not config_file.exists():
+    current_config = await read_json_file(config_cache.copy)
+    if current_config is None:
         raise HTTPException(status_code=404, detail="配置文件不存在")
     
-    with open(config_file, "r") as f:
-        current_config = json.load(f)
-    
     # 更新配置
     update_dict = config_update.dict(exclude_unset=True)
     for key, value in update_dict.items():
         if value is not None:
             current_config[key] = value
     
-    with open(config_file, "w") as f:
-        json.dump(current_config, f, indent=2)
+    await run_blocking(config_cache.write, current_config)
     
     return current_config
 
@@ -60,13 +86,10 @@ async def get_vulnerability_library():
     """
     获取漏洞库
     """
-    vulns_file = Path("data/vulnerabilities.json")
-    if not vulns_file.exists():
+    vulnerabilities = await read_json_file(library_cache.get)
+    if vulnerabilities is None:
         raise HTTPException(status_code=404, detail="漏洞库文件不存在")
     
-    with open(vulns_file, "r") as f:
-        vulnerabilities = json.load(f)
-    
     return vulnerabilities
 
 @router.patch("/vulnerabilities/{vuln_type}")
@@ -74,13 +97,10 @@ async def update_vulnerability_rule(vuln_type: str, update_data: Dict[str, Any])
     """
     更新特定漏洞类型的规则
     """
-    vulns_file = Path("data/vulnerabilities.json")
-    if not vulns_file.exists():
+    vulnerabilities = await read_json_file(library_cache.copy)
+    if vulnerabilities is None:
         raise HTTPException(status_code=404, detail="漏洞库文件不存在")
     
-    with open(vulns_file, "r") as f:
-        vulnerabilities = json.load(f)
-    
     if vuln_type not in vulnerabilities:
         raise HTTPException(status_code=404, detail=f"漏洞类型 '{vuln_type}' 不存在")
     
@@ -88,8 +108,10 @@ async def update_vulnerability_rule(vuln_type: str, update_data: Dict[str, Any])
     for key, value in update_data.items():
         vulnerabilities[vuln_type][key] = value
     
-    with open(vulns_file, "w") as f:
-        json.dump(vulnerabilities, f, indent=2)
+    await run_blocking(library_cache.write, vulnerabilities)
+    
+    # 漏洞库已修改，丢弃已编译的规则
+    invalidate_rules()
     
     return vulnerabilities[vuln_type]
 
@@ -100,13 +122,46 @@ async def reset_config():
     """
     default_config = {
         "scan_timeout": 30,
+        "fetch_retries": 2,
+        "circuit_breaker_threshold": 5,
+        "circuit_breaker_cooldown": 30,
         "concurrent_scans": 5,
+        "embedded_workers": True,
+        "job_lease_seconds": 30,
+        "max_scans_per_host": 2,
+        "max_pages": 50,
+        "max_query_variants": 10,
+        "scope_include": [],
+        "scope_exclude": [],
+        "ignored_query_params": ["utm_*", "gclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "jsessionid", "phpsessid", "aspsessionid*", "sid", "sessionid"],
+        "html_parser": "auto",
+        "probe_rate_limit": 10,
+        "probe_max_in_flight": 4,
+        "probe_budget_per_origin": 1000,
+        "analysis_workers": 2,
+        "connection_limit": 100,
+        "connection_limit_per_host": 10,
+        "dns_cache_ttl": 300,
+        "keepalive_timeout": 30,
+        "max_response_bytes": 5242880,
+        "fetch_content_types": ["text/", "application/xhtml+xml", "application/xml", "application/json"],
+        "response_cache": False,
+        "response_cache_ttl": 604800,
+        "response_cache_max_bytes": 268435456,
         "user_agent": "SecureScout/1.0",
         "default_scan_modules": ["sql_injection", "xss", "csrf", "file_upload"]
     }
     
-    config_file = Path("data/config.json")
-    with open(config_file, "w") as f:
-        json.dump(default_config, f, indent=2)
+    await run_blocking(config_cache.write, default_config)
+    
+    return default_config
+
+@router.get("/version")
+async def get_config_version():
+    """
+    获取当前配置和漏洞库的版本号，扫描结果中记录的版本号与此对应
+    """
+    _, config_version = await read_json_file(config_cache.snapshot)
+    _, library_version = await read_json_file(library_cache.snapshot)
     
-    return default_config 
\ No newline at end of file
+    return {"config_version": config_version, "library_version": library_version} 
\ No newline at end of file
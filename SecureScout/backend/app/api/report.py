@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-import json
-from pathlib import Path
 from datetime import datetime, timedelta
+from app.core.storage import result_store
+from app.core.findings import scan_to_dict
+from app.core.executor import run_blocking
+from app.core.export import ExportFilter, StreamCompressor, format_rows, EXPORT_FORMATS, EXPORT_COMPRESSIONS
 
 router = APIRouter(
     prefix="/report",
@@ -10,35 +13,120 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 导出时每批读取的扫描结果数
+EXPORT_BATCH_SIZE = 50
+
+# 报告列表每页的默认条数和最大条数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 @router.get("/")
-async def get_all_reports():
+async def get_all_reports(
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
     """
-    获取所有扫描报告
+    分页获取扫描报告，按开始时间从新到旧排列
+
+    可使用limit/offset翻页，也可以传入上一页返回的next_cursor继续读取；
+    status、since、until用于按状态和开始时间过滤
     """
-    results_file = Path("data/scan_results.json")
-    if not results_file.exists():
-        return []
-    
-    with open(results_file, "r") as f:
-        scan_results = json.load(f)
-    
-    return scan_results
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    
+    try:
+        items, next_cursor = await run_blocking(
+            result_store.query,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            status=status,
+            since=since,
+            until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "total": await run_blocking(result_store.count, status=status, since=since, until=until),
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor,
+        "items": items
+    }
+
+@router.get("/export")
+async def export_reports(
+    format: str = "ndjson",
+    compression: str = "none",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    status: Optional[str] = None,
+    host: Optional[str] = None,
+    type: Optional[str] = None,
+    severity: Optional[str] = None
+):
+    """
+    以NDJSON或CSV流式导出漏洞，每行一条漏洞及其所属扫描的ID、目标、状态和时间
+
+    since/until按扫描开始时间过滤，host按漏洞URL的主机名（含子域名）过滤，type和severity
+    可用逗号分隔多个值。compression为gzip或zstd（需安装zstandard）时以压缩文件下载。
+    扫描结果按保存顺序分批读取和发送，内存占用与导出的数据量无关
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    if compression not in EXPORT_COMPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"不支持的压缩方式: {compression}")
+    try:
+        compressor = StreamCompressor(compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    row_filter = ExportFilter(
+        host=host,
+        types=type.split(",") if type else None,
+        severities=severity.split(",") if severity else None
+    )
+    
+    async def generate():
+        # CSV先发送表头，NDJSON没有表头
+        chunk = compressor.compress(format_rows([], format, header=True).encode("utf-8"))
+        after_seq = 0
+        while True:
+            if chunk:
+                yield chunk
+            batch = await run_blocking(
+                result_store.fetch_batch, after_seq, EXPORT_BATCH_SIZE, status=status, since=since, until=until
+            )
+            if not batch:
+                break
+            after_seq = batch[-1][0]
+            rows = [row for _seq, result in batch for row in row_filter.rows(result)]
+            chunk = compressor.compress(format_rows(rows, format).encode("utf-8"))
+        chunk = compressor.flush()
+        if chunk:
+            yield chunk
+    
+    media_type, extension = EXPORT_COMPRESSIONS[compression]
+    filename = f"securescout-{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}{extension}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type or EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/{scan_id}")
-async def get_report(scan_id: str):
+async def get_report(scan_id: str, group: bool = False):
     """
-    获取特定ID的扫描报告
+    获取特定ID的扫描报告，group=true时把类型、严重程度和描述相同的漏洞合并为一组
     """
-    results_file = Path("data/scan_results.json")
-    if not results_file.exists():
-        raise HTTPException(status_code=404, detail="扫描记录不存在")
-    
-    with open(results_file, "r") as f:
-        scan_results = json.load(f)
-    
-    for result in scan_results:
-        if result.get("id") == scan_id:
-            return result
+    result = await run_blocking(result_store.get, scan_id)
+    if result:
+        return scan_to_dict(result, group) if group else result
     
     raise HTTPException(status_code=404, detail="扫描ID不存在")
 
@@ -47,38 +135,18 @@ async def get_recent_summary(days: Optional[int] = 7):
     """
     获取最近一段时间的扫描摘要统计
     """
-    results_file = Path("data/scan_results.json")
-    if not results_file.exists():
-        return {
-            "total_scans": 0,
-            "completed": 0,
-            "failed": 0,
-            "vulnerability_summary": {},
-            "severity_counts": {
-                "低": 0,
-                "中": 0,
-                "高": 0,
-                "严重": 0
-            }
-        }
-    
-    with open(results_file, "r") as f:
-        scan_results = json.load(f)
-    
     # 设置时间范围
     cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
     
-    # 过滤最近的扫描
-    recent_scans = [
-        scan for scan in scan_results 
-        if scan.get("start_time", "0") > cutoff_date
-    ]
+    # 从按天汇总的统计中读取
+    scan_counts, vuln_counts = await run_blocking(result_store.stats, since=cutoff_date)
     
     # 初始化统计
     summary = {
-        "total_scans": len(recent_scans),
-        "completed": len([s for s in recent_scans if s.get("status") == "completed"]),
-        "failed": len([s for s in recent_scans if s.get("status") == "failed"]),
+        "total_scans": sum(scan_counts.values()),
+        "completed": scan_counts.get("completed", 0),
+        "partial": scan_counts.get("partial", 0),
+        "failed": scan_counts.get("failed", 0),
         "vulnerability_summary": {},
         "severity_counts": {
             "低": 0,
@@ -89,24 +157,13 @@ async def get_recent_summary(days: Optional[int] = 7):
     }
     
     # 统计漏洞类型和严重程度
-    for scan in recent_scans:
-        if scan.get("status") != "completed":
-            continue
-            
-        vulnerabilities = scan.get("vulnerabilities", [])
-        for vuln in vulnerabilities:
-            vuln_type = vuln.get("type", "其他")
-            severity = vuln.get("severity", "中")
-            
-            # 更新漏洞类型统计
-            if vuln_type in summary["vulnerability_summary"]:
-                summary["vulnerability_summary"][vuln_type] += 1
-            else:
-                summary["vulnerability_summary"][vuln_type] = 1
-            
-            # 更新严重程度统计
-            if severity in summary["severity_counts"]:
-                summary["severity_counts"][severity] += 1
+    for (vuln_type, severity), count in vuln_counts.items():
+        # 更新漏洞类型统计
+        summary["vulnerability_summary"][vuln_type] = summary["vulnerability_summary"].get(vuln_type, 0) + count
+        
+        # 更新严重程度统计
+        if severity in summary["severity_counts"]:
+            summary["severity_counts"][severity] += count
     
     return summary
 
@@ -115,21 +172,9 @@ async def delete_report(scan_id: str):
     """
     删除特定ID的扫描报告
     """
-    results_file = Path("data/scan_results.json")
-    if not results_file.exists():
-        raise HTTPException(status_code=404, detail="扫描记录不存在")
-    
-    with open(results_file, "r") as f:
-        scan_results = json.load(f)
-    
-    filtered_results = [result for result in scan_results if result.get("id") != scan_id]
-    
-    if len(filtered_results) == len(scan_results):
+    if not await run_blocking(result_store.delete, scan_id):
         raise HTTPException(status_code=404, detail="扫描ID不存在")
     
-    with open(results_file, "w") as f:
-        json.dump(filtered_results, f, indent=2)
-    
     return {"message": "扫描报告已删除"}
 
 @router.get("/stats/vulnerability_types")
@@ -137,26 +182,10 @@ async def get_vulnerability_types_stats():
     """
     获取漏洞类型统计
     """
-    results_file = Path("data/scan_results.json")
-    if not results_file.exists():
-        return {}
-    
-    with open(results_file, "r") as f:
-        scan_results = json.load(f)
+    _, vuln_counts = await run_blocking(result_store.stats)
     
     vulnerability_counts = {}
+    for (vuln_type, _severity), count in vuln_counts.items():
+        vulnerability_counts[vuln_type] = vulnerability_counts.get(vuln_type, 0) + count
     
-    for scan in scan_results:
-        if scan.get("status") != "completed":
-            continue
-            
-        vulnerabilities = scan.get("vulnerabilities", [])
-        for vuln in vulnerabilities:
-            vuln_type = vuln.get("type", "其他")
-            
-            if vuln_type in vulnerability_counts:
-                vulnerability_counts[vuln_type] += 1
-            else:
-                vulnerability_counts[vuln_type] = 1
-    
-    return vulnerability_counts 
\ No newline at end of file
+    return vulnerability_counts
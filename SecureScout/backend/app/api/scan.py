@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
 from typing import List, Optional
-import json
 import uuid
 from datetime import datetime
-from pathlib import Path
 import asyncio
 import aiohttp
 import re
-from app.core.scanner import scan_url_for_vulnerabilities
+import time
+import logging
+from app.core.scanner import scan_url_findings, diff_findings
+from app.core.storage import result_store
+from app.core.findings import Finding, scan_to_dict
+from app.core.executor import run_blocking
+from app.core.jobs import ScanJobQueue, ScanScheduler
+from app.core.batches import interleave_by_origin
+from app.core.events import ScanEventStream, event_bus
+from app.core.metrics import registry, PERSIST_SECONDS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/scan",
@@ -20,168 +30,397 @@ class ScanRequest(BaseModel):
     url: HttpUrl
     modules: Optional[List[str]] = None
     depth: Optional[int] = 1
+    max_pages: Optional[int] = None
     headers: Optional[dict] = None
+    priority: Optional[int] = 0
+    baseline_scan_id: Optional[str] = None
 
 class BatchScanRequest(BaseModel):
     urls: List[HttpUrl]
     modules: Optional[List[str]] = None
     depth: Optional[int] = 1
+    max_pages: Optional[int] = None
     headers: Optional[dict] = None
+    priority: Optional[int] = 0
 
 class ScanResponse(BaseModel):
     scan_id: str
     status: str
     message: str
 
-# 获取所有正在进行的扫描
+# 本进程中正在执行的扫描，排队中和在其他工作进程中执行的扫描从任务队列读取
 active_scans = {}
 
-@router.post("/start", response_model=ScanResponse)
-async def start_scan(scan_request: ScanRequest, background_tasks: BackgroundTasks):
-    """
-    启动对单个URL的安全扫描
-    """
-    # 生成唯一的扫描ID
+# 跟踪队列中（排队或在其他工作进程中执行）扫描的协程，按扫描ID索引
+queue_followers = {}
+
+# 跟踪队列中扫描时读取状态的间隔（秒）
+FOLLOW_POLL_INTERVAL = 2.0
+
+def new_scan_job(url: str, request, batch_id: Optional[str] = None) -> dict:
+    """为单个URL创建扫描状态记录和队列任务，batch_id为所属批量扫描的ID"""
     scan_id = str(uuid.uuid4())
     
     # 初始化扫描状态
     scan_status = {
         "id": scan_id,
-        "url": str(scan_request.url),
+        "url": url,
         "status": "pending",
         "start_time": datetime.now().isoformat(),
         "end_time": None,
         "vulnerabilities": [],
-        "modules": scan_request.modules
+        "modules": request.modules,
+        "priority": request.priority or 0
     }
+    baseline_scan_id = getattr(request, "baseline_scan_id", None)
+    if baseline_scan_id:
+        scan_status["baseline_scan_id"] = baseline_scan_id
+    if batch_id:
+        scan_status["batch_id"] = batch_id
     
-    # 保存到活动扫描列表
-    active_scans[scan_id] = scan_status
-    
-    # 在后台运行扫描任务
-    background_tasks.add_task(
-        run_scan, 
-        scan_id=scan_id,
-        url=str(scan_request.url),
-        modules=scan_request.modules,
-        depth=scan_request.depth,
-        headers=scan_request.headers
-    )
+    return {
+        "id": scan_id,
+        "priority": request.priority,
+        "record": scan_status,
+        "params": {
+            "url": url,
+            "modules": request.modules,
+            "depth": request.depth,
+            "max_pages": request.max_pages,
+            "headers": request.headers,
+            "baseline_scan_id": baseline_scan_id,
+            "batch_id": batch_id
+        }
+    }
+
+async def enqueue_scan_jobs(jobs: List[dict]) -> List[ScanResponse]:
+    """
+    把扫描任务写入持久化队列，由本进程的调度器或app.worker工作进程执行
+
+    同一优先级的任务按源站轮流入队，批量扫描中各主机的URL交错执行，返回值仍按jobs的顺序。
+    入队时不创建事件流：任务可能由其他工作进程执行，订阅时再根据队列中的状态推送
+    """
+    await run_blocking(job_queue.enqueue, interleave_by_origin(jobs, lambda job: job["params"]["url"]))
+    scheduler.notify()
     
-    return ScanResponse(
-        scan_id=scan_id,
-        status="started",
-        message="扫描已开始"
-    )
+    return [
+        ScanResponse(scan_id=job["id"], status="started", message="扫描已开始")
+        for job in jobs
+    ]
+
+@router.post("/start", response_model=ScanResponse)
+async def start_scan(scan_request: ScanRequest):
+    """
+    启动对单个URL的安全扫描
+
+    指定baseline_scan_id时进行增量扫描：内容未变化的页面沿用基准扫描的漏洞，
+    结果中的diff列出相对基准扫描新增和已修复的漏洞
+    """
+    if scan_request.baseline_scan_id:
+        baseline = await run_blocking(result_store.get, scan_request.baseline_scan_id)
+        if baseline is None:
+            raise HTTPException(status_code=404, detail="基准扫描不存在")
+    
+    responses = await enqueue_scan_jobs([new_scan_job(str(scan_request.url), scan_request)])
+    return responses[0]
 
 @router.post("/batch", response_model=List[ScanResponse])
-async def batch_scan(batch_request: BatchScanRequest, background_tasks: BackgroundTasks):
+async def batch_scan(batch_request: BatchScanRequest):
     """
     批量启动多个URL的安全扫描
+
+    各主机的URL交错执行，同一主机同时运行的扫描数受max_scans_per_host限制；
+    同一批次中同一源站的扫描共享已爬行的页面和探测预算
     """
-    responses = []
+    batch_id = str(uuid.uuid4())
+    return await enqueue_scan_jobs([new_scan_job(str(url), batch_request, batch_id) for url in batch_request.urls])
+
+@router.delete("/{scan_id}")
+async def cancel_scan(scan_id: str):
+    """
+    取消排队中或正在进行的扫描，在其他工作进程中执行的扫描在其下次心跳时停止
+    """
+    scan_status = await run_blocking(job_queue.get_record, scan_id)
+    cancelled = await scheduler.cancel(scan_id)
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail="扫描ID不存在或已结束")
     
-    for url in batch_request.urls:
-        scan_id = str(uuid.uuid4())
-        
-        scan_status = {
-            "id": scan_id,
-            "url": str(url),
-            "status": "pending",
-            "start_time": datetime.now().isoformat(),
-            "end_time": None,
-            "vulnerabilities": [],
-            "modules": batch_request.modules
-        }
-        
-        active_scans[scan_id] = scan_status
-        
-        background_tasks.add_task(
-            run_scan, 
-            scan_id=scan_id,
-            url=str(url),
-            modules=batch_request.modules,
-            depth=batch_request.depth,
-            headers=batch_request.headers
-        )
-        
-        responses.append(
-            ScanResponse(
-                scan_id=scan_id,
-                status="started",
-                message="扫描已开始"
-            )
-        )
+    if cancelled == "pending":
+        # 排队中的任务直接记为已取消
+        if scan_status:
+            scan_status["status"] = "cancelled"
+            scan_status["end_time"] = datetime.now().isoformat()
+            await finish_scan(scan_status)
+    
+    return {"message": "扫描已取消"}
+
+@router.get("/events/{scan_id}")
+async def stream_scan_events(scan_id: str, request: Request, last_event_id: Optional[int] = None):
+    """
+    以Server-Sent Events推送扫描进度
+
+    事件类型包括status（状态变化）、page（页面扫描完成）、finding（发现漏洞）、
+    partial（目标主机熔断，部分请求未发送）、gap（客户端过慢错过的事件范围）和end（扫描结束）。断线重连时浏览器会带上Last-Event-ID，
+    也可以通过last_event_id参数指定，从该事件之后继续推送
+    """
+    header_id = request.headers.get("last-event-id")
+    if last_event_id is None and header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+    
+    stream = event_bus.get(scan_id)
+    if stream is None and scan_id in active_scans:
+        stream = event_bus.open(scan_id)
+    elif scan_id not in active_scans and (stream is None or not stream.closed):
+        # 排队中或在其他工作进程中执行的扫描，根据队列中的状态记录推送status事件
+        if await run_blocking(job_queue.get_record, scan_id) is not None:
+            stream = event_bus.open(scan_id)
+            follow_queued_scan(scan_id)
+    
+    if stream is None:
+        # 已结束且事件流已过期的扫描，直接推送最终状态
+        result = await run_blocking(result_store.get, scan_id)
+        if not result:
+            raise HTTPException(status_code=404, detail="扫描ID不存在")
+        stream = ScanEventStream()
+        stream.publish("end", {"status": result.get("status"), "vulnerabilities": len(result.get("vulnerabilities", []))})
+        stream.close()
+    
+    async def generate():
+        events = stream.subscribe(last_event_id or 0)
+        try:
+            async for event in events:
+                if await request.is_disconnected():
+                    break
+                yield event.to_sse() if event else ": keep-alive\n\n"
+        finally:
+            await events.aclose()
     
-    return responses
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/status/{scan_id}")
-async def get_scan_status(scan_id: str):
+async def get_scan_status(scan_id: str, group: bool = False):
     """
-    获取指定ID扫描的当前状态
+    获取指定ID扫描的当前状态，group=true时返回合并后的漏洞组
+
+    在其他工作进程中执行的扫描返回该进程最近一次心跳上报的状态
     """
     if scan_id in active_scans:
-        return active_scans[scan_id]
+        return scan_to_dict(active_scans[scan_id], group)
+    
+    record = await run_blocking(job_queue.get_record, scan_id)
+    if record:
+        return scan_to_dict(record, group)
     
     # 如果不在活动扫描中，检查已完成的扫描
-    results_file = Path("data/scan_results.json")
-    if results_file.exists():
-        with open(results_file, "r") as f:
-            scan_results = json.load(f)
-            for result in scan_results:
-                if result.get("id") == scan_id:
-                    return result
+    result = await run_blocking(result_store.get, scan_id)
+    if result:
+        return scan_to_dict(result, group)
     
     raise HTTPException(status_code=404, detail="扫描ID不存在")
 
 @router.get("/active")
 async def list_active_scans():
     """
-    列出所有当前活动的扫描
+    列出所有排队和进行中的扫描，包括在其他工作进程中执行的扫描
     """
-    return list(active_scans.values())
+    records = [scan_to_dict(record) for record in list(active_scans.values())]
+    for record in await run_blocking(job_queue.list_records):
+        if record["id"] not in active_scans:
+            records.append(record)
+    return records
 
-async def run_scan(scan_id: str, url: str, modules: Optional[List[str]], depth: int, headers: Optional[dict]):
+@router.get("/workers")
+async def list_workers():
     """
-    异步执行扫描过程
+    列出执行扫描任务的工作进程及其最近一次心跳，alive为False的进程已失联，其任务会被重新分配
+    """
+    return await run_blocking(job_queue.list_workers, scheduler.lease_seconds)
+
+def follow_queued_scan(scan_id: str) -> None:
+    """
+    跟踪不在本进程执行的扫描，状态变化时推送status事件，结束后推送end事件
+
+    扫描被本进程的调度器取出后由run_scan直接推送事件，跟踪随即结束
+    """
+    if scan_id in queue_followers:
+        return
+    
+    async def follow():
+        last_state = None
+        try:
+            while scan_id not in active_scans:
+                stream = event_bus.get(scan_id)
+                if stream is None or stream.closed:
+                    return
+                record = await run_blocking(job_queue.get_record, scan_id)
+                if record is None:
+                    if scan_id in active_scans:
+                        return
+                    result = await run_blocking(result_store.get, scan_id)
+                    if result:
+                        event_bus.publish(scan_id, "status", {"status": result.get("status")})
+                        event_bus.publish(scan_id, "end", {
+                            "status": result.get("status"),
+                            "vulnerabilities": len(result.get("vulnerabilities", []))
+                        })
+                    event_bus.close(scan_id)
+                    return
+                state = {
+                    "status": record.get("status"),
+                    "pages_scanned": record.get("pages_scanned", 0),
+                    "vulnerabilities": len(record.get("vulnerabilities", [])),
+                    "worker_id": record.get("worker_id")
+                }
+                if state != last_state:
+                    event_bus.publish(scan_id, "status", state)
+                    last_state = state
+                await asyncio.sleep(FOLLOW_POLL_INTERVAL)
+        except Exception as e:
+            logger.error(f"跟踪扫描 {scan_id} 的状态时出错: {str(e)}")
+        finally:
+            queue_followers.pop(scan_id, None)
+    
+    queue_followers[scan_id] = asyncio.create_task(follow())
+
+async def run_scan(
+    scan_id: str,
+    url: str,
+    modules: Optional[List[str]],
+    depth: int,
+    headers: Optional[dict],
+    max_pages: Optional[int] = None,
+    baseline_scan_id: Optional[str] = None,
+    batch_id: Optional[str] = None
+):
+    """
+    异步执行扫描过程，由调度器的工作协程调用
     """
     # 更新状态为进行中
     active_scans[scan_id]["status"] = "in_progress"
+    active_scans[scan_id]["vulnerabilities"] = []
+    active_scans[scan_id]["pages"] = []
+    event_bus.publish(scan_id, "status", {"status": "in_progress"})
+    
+    def on_progress(event: str, data: dict) -> None:
+        # 扫描过程中实时更新状态并推送事件
+        if event == "start":
+            active_scans[scan_id].update(data)
+        elif event == "timings":
+            active_scans[scan_id]["timings"] = data
+        elif event == "partial":
+            active_scans[scan_id]["skipped_requests"] = data["skipped_requests"]
+        elif event == "finding":
+            active_scans[scan_id]["vulnerabilities"].append(Finding.from_dict(data))
+        elif event == "page":
+            active_scans[scan_id]["pages_scanned"] = data["pages_done"]
+            active_scans[scan_id]["pages"].append({
+                "url": data["url"],
+                "status": data["status"],
+                "hash": data["hash"]
+            })
+        event_bus.publish(scan_id, event, data)
     
     try:
+        baseline = None
+        if baseline_scan_id:
+            baseline = await run_blocking(result_store.get, baseline_scan_id)
+            if baseline is None:
+                logger.warning(f"基准扫描 {baseline_scan_id} 不存在，执行完整扫描")
+        
         # 执行实际的扫描操作
-        vulnerabilities = await scan_url_for_vulnerabilities(url, modules, depth, headers)
+        vulnerabilities = await scan_url_findings(
+            url, modules, depth, headers, max_pages, on_progress, baseline, batch_id
+        )
         
         # 更新扫描结果
         active_scans[scan_id]["vulnerabilities"] = vulnerabilities
-        active_scans[scan_id]["status"] = "completed"
+        if baseline is not None:
+            active_scans[scan_id]["diff"] = diff_findings(baseline.get("vulnerabilities", []), vulnerabilities)
+        # 目标主机熔断导致部分请求未发送时，扫描结果不完整
+        active_scans[scan_id]["status"] = "partial" if active_scans[scan_id].get("skipped_requests") else "completed"
         active_scans[scan_id]["end_time"] = datetime.now().isoformat()
         
         # 保存到历史记录
-        save_scan_result(active_scans[scan_id])
+        await finish_scan(active_scans[scan_id])
+        
+    except asyncio.CancelledError:
+        # 服务关闭时保留任务，重启后恢复执行
+        if not scheduler.cancel_requested(scan_id):
+            # 任务放回队列或已由其他工作进程接手，有订阅者时改为根据队列中的状态推送事件
+            active_scans.pop(scan_id, None)
+            stream = event_bus.get(scan_id)
+            if stream is not None and stream.subscribers:
+                follow_queued_scan(scan_id)
+            else:
+                event_bus.discard(scan_id)
+            raise
+        active_scans[scan_id]["status"] = "cancelled"
+        active_scans[scan_id]["end_time"] = datetime.now().isoformat()
+        await finish_scan(active_scans[scan_id])
         
     except Exception as e:
         active_scans[scan_id]["status"] = "failed"
         active_scans[scan_id]["error"] = str(e)
         active_scans[scan_id]["end_time"] = datetime.now().isoformat()
-        save_scan_result(active_scans[scan_id])
+        await finish_scan(active_scans[scan_id])
     
     # 从活动扫描中移除
     active_scans.pop(scan_id, None)
 
-def save_scan_result(scan_result):
+async def save_scan_result(scan_result):
     """
-    将扫描结果保存到JSON文件
+    将扫描结果追加到结果数据库
     """
-    results_file = Path("data/scan_results.json")
-    
-    try:
-        with open(results_file, "r") as f:
-            scan_results = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        scan_results = []
-    
-    scan_results.append(scan_result)
-    
-    with open(results_file, "w") as f:
-        json.dump(scan_results, f, indent=2) 
\ No newline at end of file
+    started = time.perf_counter()
+    await run_blocking(result_store.save, scan_result)
+    PERSIST_SECONDS.observe(time.perf_counter() - started)
+
+async def finish_scan(scan_result):
+    """
+    保存结束的扫描并推送最终状态，随后关闭事件流
+    """
+    await save_scan_result(scan_result)
+    scan_id = scan_result["id"]
+    event_bus.publish(scan_id, "status", {"status": scan_result["status"]})
+    event_bus.publish(scan_id, "end", {
+        "status": scan_result["status"],
+        "vulnerabilities": len(scan_result.get("vulnerabilities", []))
+    })
+    event_bus.close(scan_id)
+
+async def start_scheduler(
+    workers: int,
+    worker_id: Optional[str] = None,
+    lease_seconds: Optional[float] = None,
+    max_per_origin: Optional[int] = None
+) -> None:
+    """
+    启动扫描调度器，workers为0时本进程只负责入队，由app.worker工作进程执行扫描；
+    max_per_origin为同一源站同时运行的扫描数上限
+    """
+    await scheduler.start(workers, worker_id, lease_seconds, max_per_origin)
+
+def _claim_job(job: dict) -> None:
+    active_scans[job["id"]] = job["record"]
+
+def _job_snapshot(scan_id: str) -> Optional[dict]:
+    record = active_scans.get(scan_id)
+    return scan_to_dict(record) if record is not None else None
+
+def _scan_counts() -> dict:
+    counts = {}
+    for record in list(active_scans.values()):
+        key = (record.get("status", ""),)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+# 排队和进行中的扫描数
+registry.gauge("securescout_active_scans", "排队和进行中的扫描数", ["status"], callback=_scan_counts)
+
+# 持久化扫描队列和调度器
+job_queue = ScanJobQueue()
+scheduler = ScanScheduler(job_queue, run_scan, on_claim=_claim_job, snapshot=_job_snapshot)
@@ -0,0 +1,301 @@
+"""
+SecureScout命令行批量扫描
+
+在backend目录下运行，从文件或标准输入逐行读取URL（空行和#开头的行被忽略）：
+
+    python -m app.cli urls.txt -o results.ndjson -c 8
+    cat urls.txt | python -m app.cli - --checkpoint run.ckpt > results.ndjson
+
+每个URL扫描结束后向输出写入一行JSON（NDJSON），包含输入行号、URL、状态和漏洞列表。
+输入按需读取，同时在内存中的URL不超过并发数的两倍，内存占用与列表长度无关。
+进度定期保存在检查点文件中（默认为输出文件名加.ckpt），中断后使用相同的输入和参数再次运行
+即从中断处继续，结果追加到原输出文件；中断时正在扫描的URL会重新扫描，可能在输出中出现两次。
+"""
+import os
+import sys
+import stat
+import json
+import time
+import signal
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, TextIO, AsyncIterator
+
+from app.core.executor import configure_analysis_pool, shutdown_executors, DEFAULT_ANALYSIS_WORKERS
+from app.core.scanner import scan_url_for_vulnerabilities, load_scan_config
+from app.core.http import session_manager
+
+logger = logging.getLogger(__name__)
+
+# 默认同时扫描的URL数
+DEFAULT_CLI_CONCURRENCY = 4
+
+# 从文件读取时每批的行数，每批之间让出事件循环
+INPUT_BATCH_LINES = 256
+
+# 从管道读取时单行的最大长度
+MAX_LINE_BYTES = 1024 * 1024
+
+# 两次保存检查点之间的最短间隔（秒）
+CHECKPOINT_INTERVAL = 5.0
+
+class Checkpoint:
+    """
+    批量扫描的进度检查点
+
+    输入行号从0开始。watermark之前的行全部已完成，done为watermark之后已完成的行号；
+    并发扫描乱序完成时，done只包含最慢的扫描之后已完成的少量行号。
+    保存时先写临时文件再替换，进程在任何时刻中断都不会留下损坏的检查点。
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.completed = 0
+        self.findings = 0
+
+    def load(self) -> bool:
+        """读取已有的检查点，不存在时返回False"""
+        if self.path is None or not self.path.exists():
+            return False
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        self.watermark = data.get("watermark", 0)
+        self.done = set(data.get("done", []))
+        self.completed = data.get("completed", 0)
+        self.findings = data.get("findings", 0)
+        return True
+
+    def is_done(self, line: int) -> bool:
+        return line < self.watermark or line in self.done
+
+    def mark(self, line: int) -> None:
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "watermark": self.watermark,
+                "done": sorted(self.done),
+                "completed": self.completed,
+                "findings": self.findings,
+                "updated_at": datetime.now().isoformat()
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+def parse_headers(values: Optional[List[str]]) -> Optional[Dict[str, str]]:
+    """把"名称: 值"形式的参数解析为请求头字典"""
+    if not values:
+        return None
+    headers = {}
+    for value in values:
+        name, sep, content = value.partition(":")
+        if not sep or not name.strip():
+            raise ValueError(f"无效的请求头: {value}")
+        headers[name.strip()] = content.strip()
+    return headers
+
+async def read_lines(source: TextIO) -> AsyncIterator[str]:
+    """
+    逐行读取输入
+
+    普通文件直接分批读取；管道和终端通过事件循环异步读取，等待输入时不阻塞扫描，
+    中断时也不会留下阻塞在读取上的线程
+    """
+    if stat.S_ISREG(os.fstat(source.fileno()).st_mode):
+        while True:
+            batch = list(islice(source, INPUT_BATCH_LINES))
+            if not batch:
+                return
+            for line in batch:
+                yield line
+            await asyncio.sleep(0)
+    
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), source)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            yield line.decode("utf-8", "replace")
+    finally:
+        transport.close()
+
+async def run_bulk_scan(
+    source: TextIO,
+    output: TextIO,
+    checkpoint: Checkpoint,
+    concurrency: int = DEFAULT_CLI_CONCURRENCY,
+    modules: Optional[List[str]] = None,
+    depth: int = 1,
+    max_pages: Optional[int] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    逐行读取source中的URL并发扫描，结果以NDJSON写入output
+
+    检查点中已完成的行被跳过。每行结果写入并刷新后才计入检查点，因此检查点记录的行
+    一定已经在输出中。
+    """
+    concurrency = max(1, int(concurrency))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    last_saved = time.monotonic()
+
+    def finish(line: int, record: Optional[Dict[str, Any]] = None) -> None:
+        nonlocal last_saved
+        if record is not None:
+            output.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            output.flush()
+            checkpoint.completed += 1
+            checkpoint.findings += len(record["vulnerabilities"])
+        checkpoint.mark(line)
+        if time.monotonic() - last_saved >= CHECKPOINT_INTERVAL:
+            checkpoint.save()
+            last_saved = time.monotonic()
+            logger.info(f"已完成 {checkpoint.completed} 个URL，发现 {checkpoint.findings} 个漏洞")
+
+    async def produce() -> None:
+        line = 0
+        async for text in read_lines(source):
+            url = text.strip()
+            if checkpoint.is_done(line):
+                pass
+            elif not url or url.startswith("#"):
+                finish(line)
+            else:
+                await queue.put((line, url))
+            line += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            line, url = item
+            start_time = datetime.now().isoformat()
+            partial: Dict[str, Any] = {}
+            
+            def on_progress(event: str, data: Dict[str, Any]) -> None:
+                if event == "partial":
+                    partial.update(data)
+            
+            if not url.startswith(("http://", "https://")):
+                status, findings, error = "invalid", [], "URL必须以http://或https://开头"
+            else:
+                try:
+                    findings = await scan_url_for_vulnerabilities(url, modules, depth, headers, max_pages, on_progress)
+                    # 目标主机熔断导致部分请求未发送时记为partial
+                    status, error = "partial" if partial else "completed", None
+                except Exception as e:
+                    status, findings, error = "failed", [], str(e)
+            record = {
+                "line": line + 1,
+                "url": url,
+                "status": status,
+                "start_time": start_time,
+                "end_time": datetime.now().isoformat(),
+                "vulnerabilities": findings
+            }
+            if error:
+                record["error"] = error
+            if partial:
+                record["skipped_requests"] = partial["skipped_requests"]
+            finish(line, record)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await produce()
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        checkpoint.save()
+
+async def main_async(args: argparse.Namespace) -> int:
+    headers = parse_headers(args.header)
+    config = load_scan_config()
+    configure_analysis_pool(config.get("analysis_workers", DEFAULT_ANALYSIS_WORKERS))
+    await session_manager.start(config)
+
+    checkpoint_path = args.checkpoint or (f"{args.output}.ckpt" if args.output else None)
+    checkpoint = Checkpoint(Path(checkpoint_path) if checkpoint_path else None)
+    if checkpoint.load():
+        logger.info(f"从检查点继续：跳过前 {checkpoint.watermark} 行及 {len(checkpoint.done)} 个已完成的行")
+    elif checkpoint.path is None:
+        logger.warning("输出到标准输出且未指定--checkpoint，中断后无法继续")
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+
+    # SIGTERM与Ctrl+C一样取消扫描并保存检查点
+    main_task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+
+    try:
+        await run_bulk_scan(
+            source,
+            output,
+            checkpoint,
+            concurrency=args.concurrency,
+            modules=args.modules.split(",") if args.modules else None,
+            depth=args.depth,
+            max_pages=args.max_pages,
+            headers=headers
+        )
+    except asyncio.CancelledError:
+        logger.info(f"扫描已中断，进度已保存到 {checkpoint.path}" if checkpoint.path else "扫描已中断")
+        return 130
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        await session_manager.close()
+
+    logger.info(f"扫描完成：共 {checkpoint.completed} 个URL，发现 {checkpoint.findings} 个漏洞")
+    return 0
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SecureScout命令行批量扫描")
+    parser.add_argument("input", help="每行一个URL的文件，-表示标准输入")
+    parser.add_argument("-o", "--output", help="NDJSON结果文件（追加写入），默认输出到标准输出")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CLI_CONCURRENCY, help="同时扫描的URL数")
+    parser.add_argument("--checkpoint", help="检查点文件，默认为输出文件名加.ckpt")
+    parser.add_argument("--modules", help="逗号分隔的检测模块，默认使用配置中的default_scan_modules")
+    parser.add_argument("--depth", type=int, default=1, help="爬行层数，1表示只扫描输入的URL")
+    parser.add_argument("--max-pages", type=int, help="每个URL最多访问的页面数，默认使用配置中的max_pages")
+    parser.add_argument("-H", "--header", action="append", help="自定义请求头，格式为\"名称: 值\"，可重复指定")
+    args = parser.parse_args()
+    try:
+        parse_headers(args.header)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        code = asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        code = 130
+    finally:
+        shutdown_executors()
+    sys.exit(code)
+
+if __name__ == "__main__":
+    main()
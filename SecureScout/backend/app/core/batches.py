@@ -0,0 +1,109 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Optional, Set, Tuple, Callable, TypeVar
+from urllib.parse import urlsplit
+
+from app.core.urls import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 默认同一源站同时执行的扫描数上限
+DEFAULT_MAX_SCANS_PER_HOST = 2
+
+# 默认批量扫描中每个源站的探测请求预算，0表示不限制
+DEFAULT_PROBE_BUDGET_PER_ORIGIN = 1000
+
+# 批量扫描的共享状态在最后一次使用后保留的时间（秒）
+ORIGIN_STATE_TTL = 3600
+
+def origin_of(url: str) -> str:
+    """URL的源站（协议://主机[:端口]），按规范化后的形式比较"""
+    canonical = canonicalize_url(url) or url
+    parts = urlsplit(canonical)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def interleave_by_origin(items: List[T], url_of: Callable[[T], str]) -> List[T]:
+    """
+    按源站分组后轮流各取一项，同一源站内保持原顺序
+
+    例如[a1, a2, a3, b1, c1]排列为[a1, b1, c1, a2, a3]，批量扫描入队时使用，
+    使各主机的扫描交错执行
+    """
+    groups: "OrderedDict[str, List[T]]" = OrderedDict()
+    for item in items:
+        groups.setdefault(origin_of(url_of(item)), []).append(item)
+    ordered: List[T] = []
+    queues = [list(reversed(group)) for group in groups.values()]
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop())
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+class OriginState:
+    """
+    同一批量扫描中同一源站的各个扫描共享的状态
+
+    visited为已由其中某个扫描爬行的规范化URL，其他扫描不再重复爬行；
+    probe_budget为这些扫描合计可以发送的探测请求数（None表示不限制）
+    """
+
+    def __init__(self, origin: str, probe_budget: Optional[int] = None):
+        self.origin = origin
+        self.visited: Set[str] = set()
+        self.probe_budget = probe_budget
+        self.probes_used = 0
+        self.budget_exhausted = False
+        self.touched = time.monotonic()
+
+    def seen(self, url: str) -> bool:
+        return url in self.visited
+
+    def mark(self, url: str) -> None:
+        self.visited.add(url)
+
+    def take_probe(self) -> bool:
+        """消耗一次探测预算，预算用完时返回False"""
+        if self.probe_budget is None:
+            return True
+        if self.probes_used >= self.probe_budget:
+            if not self.budget_exhausted:
+                self.budget_exhausted = True
+                logger.warning(f"源站 {self.origin} 的探测预算（{self.probe_budget}次）已用完，跳过其余探测")
+            return False
+        self.probes_used += 1
+        return True
+
+class BatchRegistry:
+    """
+    进程内的批量扫描共享状态，按(批次ID, 源站)索引
+
+    同一批次、同一源站的扫描可能先后执行，状态在最后一次使用ORIGIN_STATE_TTL秒后才丢弃。
+    多个工作进程之间不共享，每个进程各自维护。
+    """
+
+    def __init__(self, ttl: float = ORIGIN_STATE_TTL):
+        self.ttl = ttl
+        self._states: Dict[Tuple[str, str], OriginState] = {}
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        expired = [key for key, state in self._states.items() if state.touched < cutoff]
+        for key in expired:
+            del self._states[key]
+
+    def get(self, batch_id: str, url: str, probe_budget: Optional[int] = None) -> OriginState:
+        """获取URL所在源站在该批次中的共享状态，不存在时创建"""
+        self._prune()
+        origin = origin_of(url)
+        state = self._states.get((batch_id, origin))
+        if state is None:
+            state = self._states[(batch_id, origin)] = OriginState(origin, probe_budget)
+        state.touched = time.monotonic()
+        return state
+
+# 应用共用的批量扫描状态
+batch_registry = BatchRegistry()
@@ -0,0 +1,217 @@
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from app.core.urls import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# 响应缓存数据库
+RESPONSE_CACHE_DB_FILE = Path("data/http_cache.db")
+
+# 缓存条目默认保留时间（秒）
+DEFAULT_RESPONSE_CACHE_TTL = 7 * 24 * 3600
+
+# 缓存默认最多占用的响应体字节数（压缩后）
+DEFAULT_RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 每写入多少条后检查一次过期和容量
+PRUNE_INTERVAL = 50
+
+def cache_key(url: str, headers: Optional[Dict[str, str]] = None) -> str:
+    """缓存键：规范化URL加上本次扫描的自定义请求头"""
+    canonical = canonicalize_url(url) or url
+    header_items = sorted((name.lower(), value) for name, value in (headers or {}).items())
+    raw = json.dumps([canonical, header_items], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
+
+class CachedResponse:
+    """缓存中的一条响应及上次扫描该页面的分析结果"""
+
+    def __init__(self, key: str, row: tuple):
+        (self.key, self.url, self.status, headers, self.content_type, body,
+         self.etag, self.last_modified, self.analysis_key, findings, links) = row
+        self.headers: Dict[str, str] = json.loads(headers)
+        self.text = zlib.decompress(body).decode("utf-8")
+        self.findings: Optional[List[Dict[str, Any]]] = json.loads(findings) if findings else None
+        self.links: Optional[List[str]] = json.loads(links) if links else None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """再验证使用的条件请求头"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> Dict[str, Any]:
+        """还原为fetch_url格式的响应，not_modified表示经过304再验证"""
+        return {
+            "status": self.status,
+            "text": self.text,
+            "headers": self.headers,
+            "url": self.url,
+            "content_type": self.content_type,
+            "bytes": len(self.text.encode("utf-8")),
+            "truncated": False,
+            "skipped": False,
+            "cache_key": self.key,
+            "not_modified": True
+        }
+
+    def analysis(self, analysis_key: str) -> Optional[Dict[str, Any]]:
+        """返回与analysis_key（检测模块、规则版本和范围）一致的上次分析结果"""
+        if self.analysis_key != analysis_key or self.findings is None or self.links is None:
+            return None
+        return {"findings": self.findings, "links": self.links}
+
+class ResponseCache:
+    """
+    跨扫描的磁盘HTTP响应缓存
+
+    只缓存带ETag或Last-Modified的完整响应，再次扫描时发送条件请求，304时直接使用缓存的
+    响应体和上次的分析结果。条目超过ttl秒未被验证即过期，总大小超过max_bytes时按最近
+    访问时间淘汰最旧的条目。每个线程使用独立的SQLite连接。
+    """
+
+    def __init__(
+        self,
+        db_path: Path = RESPONSE_CACHE_DB_FILE,
+        ttl: float = DEFAULT_RESPONSE_CACHE_TTL,
+        max_bytes: int = DEFAULT_RESPONSE_CACHE_MAX_BYTES
+    ):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def configure(self, ttl: Optional[float] = None, max_bytes: Optional[int] = None) -> None:
+        if ttl is not None:
+            self.ttl = ttl
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    content_type TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    analysis_key TEXT,
+                    findings TEXT,
+                    links TEXT,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """返回未过期的缓存条目"""
+        row = self.conn.execute(
+            """SELECT key, url, status, headers, content_type, body, etag, last_modified,
+                      analysis_key, findings, links
+               FROM responses WHERE key = ? AND stored_at >= ?""",
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        return CachedResponse(key, row) if row else None
+
+    def touch(self, key: str) -> None:
+        """响应经304验证未变化，刷新过期时间和访问时间"""
+        now = time.time()
+        self.conn.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def put(self, key: str, response: Dict[str, Any]) -> bool:
+        """缓存带验证器的完整响应，不可缓存时返回False"""
+        headers = {name.lower(): value for name, value in response["headers"].items()}
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        cache_control = headers.get("cache-control", "").lower()
+        if (
+            response["status"] != 200
+            or response.get("truncated")
+            or response.get("skipped")
+            or not (etag or last_modified)
+            or "no-store" in cache_control
+        ):
+            return False
+
+        body = zlib.compress(response["text"].encode("utf-8"))
+        now = time.time()
+        self.conn.execute(
+            """INSERT OR REPLACE INTO responses
+               (key, url, status, headers, content_type, body, etag, last_modified,
+                analysis_key, findings, links, size, stored_at, accessed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, NULL, ?, ?, ?)""",
+            (key, response["url"], response["status"], json.dumps(response["headers"]),
+             response["content_type"], body, etag, last_modified, len(body), now, now)
+        )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+        return True
+
+    def put_analysis(
+        self,
+        key: str,
+        analysis_key: str,
+        findings: List[Dict[str, Any]],
+        links: List[str]
+    ) -> None:
+        """记录页面的分析结果，页面未变化时下次扫描直接复用"""
+        self.conn.execute(
+            "UPDATE responses SET analysis_key = ?, findings = ?, links = ? WHERE key = ?",
+            (analysis_key, json.dumps(findings, ensure_ascii=False), json.dumps(links), key)
+        )
+
+    def prune(self) -> int:
+        """删除过期条目，并按访问时间淘汰超出容量的条目，返回删除的条目数"""
+        conn = self.conn
+        removed = conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            keys = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                keys.append(key)
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+            removed += len(keys)
+        if removed:
+            logger.info(f"响应缓存清理了 {removed} 条记录")
+        return removed
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM responses")
+
+# 应用共用的响应缓存
+response_cache = ResponseCache()
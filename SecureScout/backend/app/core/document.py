@@ -0,0 +1,132 @@
+import logging
+from typing import List, Dict, Any, Optional
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# 可选的高性能解析后端，未安装时退回BeautifulSoup自带的html.parser
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+PARSER_BACKENDS = ["selectolax", "lxml", "html.parser"]
+
+def available_backends() -> List[str]:
+    """返回当前环境可用的解析后端，按速度从快到慢排列"""
+    backends = []
+    if SelectolaxParser is not None:
+        backends.append("selectolax")
+    if HAS_LXML:
+        backends.append("lxml")
+    backends.append("html.parser")
+    return backends
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """根据配置选择解析后端，auto或不可用时选择最快的可用后端"""
+    backends = available_backends()
+    if backend and backend != "auto":
+        if backend in backends:
+            return backend
+        logger.warning(f"解析后端 {backend} 不可用，改用 {backends[0]}")
+    return backends[0]
+
+class ParsedPage:
+    """
+    单个页面的解析结果
+
+    HTML只解析一次，并在一次遍历中建立表单、输入框、链接和文件上传字段的索引，
+    供所有检测模块和链接提取共用。索引中的元素均为普通字典，与解析后端无关：
+
+    - forms: {"id", "action", "method", "inputs": [...]}
+    - inputs: {"name", "type", "accept", "form"}，form为所属表单在forms中的下标，不在表单中时为None
+    - anchors: 所有<a href>的href值
+    - file_inputs: type为file的输入框
+    - base_href: <base href>的值
+    """
+
+    def __init__(self, url: str, html: str, backend: Optional[str] = None):
+        self.url = url
+        self.html = html
+        self.backend = resolve_backend(backend)
+        self.forms: List[Dict[str, Any]] = []
+        self.inputs: List[Dict[str, Any]] = []
+        self.anchors: List[str] = []
+        self.file_inputs: List[Dict[str, Any]] = []
+        self.base_href: Optional[str] = None
+
+        try:
+            if self.backend == "selectolax":
+                self._index_selectolax()
+            else:
+                self._index_soup()
+        except Exception as e:
+            logger.error(f"解析页面时出错 {url}: {str(e)}")
+
+    def _add_form(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        form = {
+            "id": attrs.get("id"),
+            "action": attrs.get("action"),
+            "method": attrs.get("method"),
+            "inputs": []
+        }
+        self.forms.append(form)
+        return form
+
+    def _add_input(self, attrs: Dict[str, Any], form_index: Optional[int]) -> None:
+        input_field = {
+            "name": attrs.get("name"),
+            "type": attrs.get("type"),
+            "accept": attrs.get("accept"),
+            "form": form_index
+        }
+        self.inputs.append(input_field)
+        if form_index is not None:
+            self.forms[form_index]["inputs"].append(input_field)
+        if input_field["type"] == "file":
+            self.file_inputs.append(input_field)
+
+    def _index_soup(self) -> None:
+        soup = BeautifulSoup(self.html, self.backend)
+        form_indexes: Dict[int, int] = {}
+
+        # find_all按文档顺序返回，表单总是先于其内部的输入框出现
+        for tag in soup.find_all(["form", "input", "a", "base"]):
+            if tag.name == "form":
+                form_indexes[id(tag)] = len(self.forms)
+                self._add_form(tag.attrs)
+            elif tag.name == "input":
+                parent = tag.find_parent("form")
+                self._add_input(tag.attrs, form_indexes.get(id(parent)) if parent else None)
+            elif tag.name == "a":
+                if tag.get("href") is not None:
+                    self.anchors.append(tag["href"])
+            elif tag.name == "base" and self.base_href is None:
+                self.base_href = tag.get("href")
+
+    def _index_selectolax(self) -> None:
+        tree = SelectolaxParser(self.html)
+        form_indexes: Dict[int, int] = {}
+
+        for node in tree.css("form, input, a, base"):
+            attrs = node.attributes
+            if node.tag == "form":
+                form_indexes[node.mem_id] = len(self.forms)
+                self._add_form(attrs)
+            elif node.tag == "input":
+                parent = node.parent
+                while parent is not None and parent.tag != "form":
+                    parent = parent.parent
+                self._add_input(attrs, form_indexes.get(parent.mem_id) if parent is not None else None)
+            elif node.tag == "a":
+                if attrs.get("href") is not None:
+                    self.anchors.append(attrs["href"])
+            elif node.tag == "base" and self.base_href is None:
+                self.base_href = attrs.get("href")
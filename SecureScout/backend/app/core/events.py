@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Optional, AsyncIterator, List
+
+logger = logging.getLogger(__name__)
+
+# 每个扫描在内存中保留的最近事件数
+EVENT_BUFFER_SIZE = 1000
+
+# 扫描结束后事件流的保留时间（秒），便于断线的客户端补齐最后的事件
+STREAM_RETENTION = 300
+
+# 未结束的事件流在没有订阅者、也没有新事件这段时间（秒）后被丢弃，
+# 例如扫描转到其他工作进程执行后本进程不再关闭的事件流
+STREAM_IDLE_TIMEOUT = 3600
+
+# 没有新事件时发送心跳的间隔（秒）
+HEARTBEAT_INTERVAL = 15
+
+class ScanEvent:
+    """单个扫描事件，id在同一扫描内单调递增，用作SSE的事件ID"""
+
+    __slots__ = ("id", "event", "data")
+
+    def __init__(self, id: int, event: str, data: Dict[str, Any]):
+        self.id = id
+        self.event = event
+        self.data = data
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.event}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n"
+
+class ScanEventStream:
+    """
+    单个扫描的事件流
+
+    事件保存在固定大小的环形缓冲区中，发布事件从不阻塞扫描。每个订阅者按自己的进度
+    从缓冲区读取，读取速度跟不上、事件已被覆盖时会收到一个gap事件后从最早的可用事件继续，
+    因此慢客户端不会占用额外内存。订阅时传入上次收到的事件ID即可从断点继续。
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self.updated = time.monotonic()
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str, data: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        self.updated = time.monotonic()
+        self.last_id += 1
+        self.buffer.append(ScanEvent(self.last_id, event, data))
+        self._notify()
+
+    def close(self) -> None:
+        self.closed = True
+        self.closed_at = time.monotonic()
+        self._notify()
+
+    def _notify(self) -> None:
+        # 唤醒当前所有等待者，之后的等待者使用新的Event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def events_after(self, cursor: int) -> List[ScanEvent]:
+        return [event for event in self.buffer if event.id > cursor]
+
+    def expired(self, now: float) -> bool:
+        """已结束超过保留时间，或未结束但长时间无人订阅且没有新事件"""
+        if self.closed:
+            return now - self.closed_at > STREAM_RETENTION
+        return self.subscribers == 0 and now - self.updated > STREAM_IDLE_TIMEOUT
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncIterator[Optional[ScanEvent]]:
+        """
+        按顺序产出last_event_id之后的事件，流关闭并发送完毕后结束
+
+        长时间没有新事件时产出None，调用方可据此发送心跳
+        """
+        cursor = last_event_id
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                events = self.events_after(cursor)
+                if events and events[0].id > cursor + 1:
+                    yield ScanEvent(events[0].id - 1, "gap", {"missed_from": cursor + 1, "missed_to": events[0].id - 1})
+                for event in events:
+                    cursor = event.id
+                    yield event
+
+                if self.closed and cursor >= self.last_id:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.subscribers -= 1
+            self.updated = time.monotonic()
+
+class ScanEventBus:
+    """
+    进程内的扫描事件总线，按扫描ID管理事件流
+
+    事件流只为本进程执行的扫描和有订阅者的扫描创建；过期的事件流（见ScanEventStream.expired）
+    在创建新事件流时清理
+    """
+
+    def __init__(self):
+        self.streams: Dict[str, ScanEventStream] = {}
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        expired = [scan_id for scan_id, stream in self.streams.items() if stream.expired(now)]
+        for scan_id in expired:
+            del self.streams[scan_id]
+
+    def get(self, scan_id: str) -> Optional[ScanEventStream]:
+        return self.streams.get(scan_id)
+
+    def open(self, scan_id: str) -> ScanEventStream:
+        """获取扫描的事件流，不存在时创建"""
+        stream = self.streams.get(scan_id)
+        if stream is None:
+            self._prune()
+            stream = self.streams[scan_id] = ScanEventStream()
+        return stream
+
+    def publish(self, scan_id: str, event: str, data: Dict[str, Any]) -> None:
+        self.open(scan_id).publish(event, data)
+
+    def close(self, scan_id: str) -> None:
+        stream = self.streams.get(scan_id)
+        if stream is not None:
+            stream.close()
+
+    def discard(self, scan_id: str) -> None:
+        """丢弃扫描的事件流，用于不再由本进程推送事件且无人订阅的扫描"""
+        self.streams.pop(scan_id, None)
+
+# 应用共用的扫描事件总线
+event_bus = ScanEventBus()
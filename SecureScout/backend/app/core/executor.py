@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 阻塞I/O线程池大小
+IO_THREADS = 8
+
+# 默认页面分析进程数，0表示在线程池中分析
+DEFAULT_ANALYSIS_WORKERS = 2
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+_analysis_executor: Optional[Executor] = None
+
+def get_io_executor() -> ThreadPoolExecutor:
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="securescout-io")
+    return _io_executor
+
+def configure_analysis_pool(workers: int) -> None:
+    """
+    按配置创建页面分析进程池，workers为0时页面分析在I/O线程池中执行
+
+    进程池只在首次配置时创建，修改analysis_workers后需要重启服务生效
+    """
+    global _analysis_executor
+    if _analysis_executor is not None:
+        return
+    workers = max(0, int(workers))
+    if workers:
+        _analysis_executor = ProcessPoolExecutor(max_workers=workers)
+    logger.info(f"页面分析进程数: {workers}")
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在线程池中执行阻塞的文件或数据库操作"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+async def run_cpu(func: Callable[..., T], *args: Any) -> T:
+    """
+    在进程池中执行CPU密集的页面分析
+
+    func和参数必须可以被pickle；未配置进程池时退回I/O线程池
+    """
+    loop = asyncio.get_running_loop()
+    executor = _analysis_executor or get_io_executor()
+    return await loop.run_in_executor(executor, partial(func, *args))
+
+def shutdown_executors() -> None:
+    """关闭线程池和进程池"""
+    global _io_executor, _analysis_executor
+    if _analysis_executor is not None:
+        _analysis_executor.shutdown(wait=False, cancel_futures=True)
+        _analysis_executor = None
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False)
+        _io_executor = None
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监测
+
+    每隔interval秒调度一次，实际唤醒时间与预期时间之差即为事件循环延迟。
+    延迟持续偏高说明有阻塞操作占用了事件循环。
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 120):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def snapshot(self) -> Dict[str, float]:
+        """返回最近窗口内的延迟统计（毫秒）"""
+        samples = list(self.samples)
+        if not samples:
+            return {"current_ms": 0.0, "avg_ms": 0.0, "window_max_ms": 0.0, "max_ms": 0.0, "samples": 0}
+        return {
+            "current_ms": round(samples[-1] * 1000, 3),
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "window_max_ms": round(max(samples) * 1000, 3),
+            "max_ms": round(self.max_lag * 1000, 3),
+            "samples": len(samples)
+        }
+
+# 应用共用的事件循环延迟监测
+loop_monitor = LoopLagMonitor()
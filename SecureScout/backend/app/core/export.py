@@ -0,0 +1,110 @@
+import io
+import csv
+import json
+import zlib
+from urllib.parse import urlsplit
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+# 可选的zstd压缩，未安装时只支持gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 导出格式和对应的媒体类型
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+# 压缩方式、媒体类型和文件扩展名
+EXPORT_COMPRESSIONS = {
+    "none": (None, ""),
+    "gzip": ("application/gzip", ".gz"),
+    "zstd": ("application/zstd", ".zst")
+}
+
+# 导出的列，每行为一条漏洞及其所属扫描的信息
+EXPORT_COLUMNS = [
+    "scan_id", "scan_url", "scan_status", "start_time", "end_time",
+    "type", "severity", "url", "description", "details", "test_url", "confidence"
+]
+
+class ExportFilter:
+    """
+    导出时按主机、漏洞类型和严重程度过滤漏洞
+
+    host与漏洞URL（没有时为扫描目标URL）的主机名比较，也匹配其子域名；
+    types和severities为空时不过滤
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        types: Optional[Iterable[str]] = None,
+        severities: Optional[Iterable[str]] = None
+    ):
+        self.host = host.lower().strip(".") if host else None
+        self.types = set(types) if types else None
+        self.severities = set(severities) if severities else None
+
+    def _host_matches(self, url: Optional[str]) -> bool:
+        hostname = (urlsplit(url).hostname or "") if url else ""
+        return hostname == self.host or hostname.endswith("." + self.host)
+
+    def rows(self, scan_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """产出扫描结果中符合条件的漏洞行"""
+        scan_url = scan_result.get("url")
+        for finding in scan_result.get("vulnerabilities", []):
+            if self.types is not None and finding.get("type") not in self.types:
+                continue
+            if self.severities is not None and finding.get("severity") not in self.severities:
+                continue
+            if self.host is not None and not self._host_matches(finding.get("url") or scan_url):
+                continue
+            yield {
+                "scan_id": scan_result.get("id"),
+                "scan_url": scan_url,
+                "scan_status": scan_result.get("status"),
+                "start_time": scan_result.get("start_time"),
+                "end_time": scan_result.get("end_time"),
+                "type": finding.get("type"),
+                "severity": finding.get("severity"),
+                "url": finding.get("url"),
+                "description": finding.get("description"),
+                "details": finding.get("details"),
+                "test_url": finding.get("test_url"),
+                "confidence": finding.get("confidence")
+            }
+
+def format_rows(rows: List[Dict[str, Any]], fmt: str, header: bool = False) -> str:
+    """把一批漏洞行格式化为NDJSON或CSV文本，header为True时CSV输出表头"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
+    return "".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows)
+
+class StreamCompressor:
+    """流式压缩器，compress()返回当前可以发送的压缩数据，flush()结束压缩流"""
+
+    def __init__(self, compression: str = "none"):
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif compression == "zstd":
+            if zstandard is None:
+                raise ValueError("未安装zstandard，不支持zstd压缩")
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+        elif compression == "none":
+            self._compressor = None
+        else:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) if self._compressor else data
+
+    def flush(self) -> bytes:
+        return self._compressor.flush() if self._compressor else b""
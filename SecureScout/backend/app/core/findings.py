@@ -0,0 +1,223 @@
+import sys
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Union
+
+# 漏洞记录的固定字段，紧凑编码时按此顺序排列
+FINDING_FIELDS = ("type", "url", "description", "severity", "details", "test_url", "confidence")
+
+# 紧凑编码中表示字段不存在的下标
+ABSENT = -1
+
+class Finding:
+    """
+    一条漏洞记录
+
+    使用__slots__代替字典，type、description、severity和confidence经过驻留，同类漏洞共享
+    同一个字符串对象。支持get()和下标访问，可以直接传给按字典读取漏洞的函数；
+    对外返回时用to_dict()还原为原来的字典格式。固定字段以外的键保存在extra中。
+    """
+
+    __slots__ = FINDING_FIELDS + ("extra",)
+
+    def __init__(
+        self,
+        type: str,
+        url: Optional[str] = None,
+        description: Optional[str] = None,
+        severity: Optional[str] = None,
+        details: Optional[str] = None,
+        test_url: Optional[str] = None,
+        confidence: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None
+    ):
+        self.type = _intern(type)
+        self.url = url
+        self.description = _intern(description)
+        self.severity = _intern(severity)
+        self.details = details
+        self.test_url = test_url
+        self.confidence = _intern(confidence)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Union["Finding", Dict[str, Any]]) -> "Finding":
+        if isinstance(data, Finding):
+            return data
+        if data.get("type") is None:
+            raise ValueError(f"漏洞记录缺少type字段: {data!r}")
+        fields = {name: data[name] for name in FINDING_FIELDS if data.get(name) is not None}
+        extra = {key: value for key, value in data.items() if key not in FINDING_FIELDS}
+        return cls(extra=extra, **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for name in FINDING_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def key(self) -> Tuple:
+        """完全相同的漏洞记录具有相同的键，用于去重"""
+        return (self.type, self.url, self.test_url, self.details, self.description)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in FINDING_FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __repr__(self) -> str:
+        return f"Finding({self.type!r}, {self.url!r}, {self.severity!r})"
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+class FindingList:
+    """
+    按发现顺序保存的漏洞列表，丢弃完全相同的重复记录
+
+    同一页面经不同链接（例如参数顺序不同）被扫描多次时，只保留一份漏洞。
+    """
+
+    def __init__(self, findings: Iterable[Union[Finding, Dict[str, Any]]] = ()):
+        self._items: List[Finding] = []
+        self._keys = set()
+        self.extend(findings)
+
+    def add(self, finding: Union[Finding, Dict[str, Any]]) -> Optional[Finding]:
+        """加入一条漏洞，重复时返回None"""
+        finding = Finding.from_dict(finding)
+        key = finding.key()
+        if key in self._keys:
+            return None
+        self._keys.add(key)
+        self._items.append(finding)
+        return finding
+
+    def extend(self, findings: Iterable[Union[Finding, Dict[str, Any]]]) -> List[Finding]:
+        """加入多条漏洞，返回其中新增的记录"""
+        added = []
+        for finding in findings:
+            finding = self.add(finding)
+            if finding is not None:
+                added.append(finding)
+        return added
+
+    def __iter__(self) -> Iterator[Finding]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def to_list(self) -> List[Finding]:
+        return list(self._items)
+
+def findings_to_dicts(findings: Iterable[Union[Finding, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """把漏洞记录还原为字典列表，已是字典的原样返回"""
+    return [finding.to_dict() if isinstance(finding, Finding) else finding for finding in findings]
+
+def scan_to_dict(record: Dict[str, Any], group: bool = False) -> Dict[str, Any]:
+    """
+    把扫描记录转换为接口返回的格式
+
+    活动扫描中的漏洞以Finding对象保存，这里还原为字典；group为True时用vulnerability_groups
+    （见group_findings）和vulnerability_count代替逐条的vulnerabilities
+    """
+    view = dict(record)
+    vulnerabilities = record.get("vulnerabilities", [])
+    if group:
+        view.pop("vulnerabilities", None)
+        view["vulnerability_count"] = len(vulnerabilities)
+        view["vulnerability_groups"] = group_findings(vulnerabilities)
+    else:
+        view["vulnerabilities"] = findings_to_dicts(vulnerabilities)
+    return view
+
+def group_findings(findings: Iterable[Union[Finding, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    把类型、严重程度和描述相同的漏洞合并为一组
+
+    每组包含count（记录数）和urls（出现的页面，按首次出现的顺序），
+    组按首次出现的顺序排列
+    """
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for finding in findings:
+        key = (finding.get("type"), finding.get("severity"), finding.get("description"))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "type": key[0],
+                "severity": key[1],
+                "description": key[2],
+                "count": 0,
+                "urls": {}
+            }
+        group["count"] += 1
+        url = finding.get("url")
+        if url is not None:
+            group["urls"][url] = None
+    for group in groups.values():
+        group["urls"] = list(group["urls"])
+    return list(groups.values())
+
+def encode_findings(findings: Iterable[Union[Finding, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    把漏洞列表编码为字符串表加下标行的紧凑格式
+
+    strings中每个不同的字符串只出现一次，rows中每条记录按FINDING_FIELDS的顺序保存字段在
+    strings中的下标，不存在的字段为-1，末尾不存在的字段省略；非字符串的值和其他键以字典
+    形式附在行尾。
+    """
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+    rows: List[List[Any]] = []
+    for finding in findings:
+        data = finding.to_dict() if isinstance(finding, Finding) else finding
+        row: List[Any] = []
+        extra = {}
+        for name in FINDING_FIELDS:
+            value = data.get(name)
+            if isinstance(value, str):
+                position = index.get(value)
+                if position is None:
+                    position = index[value] = len(strings)
+                    strings.append(value)
+                row.append(position)
+            else:
+                if value is not None or name in data:
+                    extra[name] = value
+                row.append(ABSENT)
+        while row and row[-1] == ABSENT:
+            row.pop()
+        extra.update((key, value) for key, value in data.items() if key not in FINDING_FIELDS)
+        if extra:
+            row.append(extra)
+        rows.append(row)
+    return {"fields": list(FINDING_FIELDS), "strings": strings, "rows": rows}
+
+def decode_findings(encoded: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """还原encode_findings编码的漏洞列表"""
+    fields = encoded.get("fields", FINDING_FIELDS)
+    strings = encoded.get("strings", [])
+    findings = []
+    for row in encoded.get("rows", []):
+        extra = row[-1] if row and isinstance(row[-1], dict) else None
+        data = {}
+        for name, position in zip(fields, row[:-1] if extra is not None else row):
+            if position != ABSENT:
+                data[name] = strings[position]
+        if extra:
+            data.update(extra)
+        findings.append(data)
+    return findings
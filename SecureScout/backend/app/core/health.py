@@ -0,0 +1,150 @@
+import time
+import random
+import logging
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 默认单个请求的最长时间（秒），对应配置中的scan_timeout
+DEFAULT_SCAN_TIMEOUT = 30
+
+# 尚未测得往返时间的主机使用的超时（秒）
+INITIAL_REQUEST_TIMEOUT = 10.0
+
+# 自适应超时的下限（秒）
+MIN_REQUEST_TIMEOUT = 2.0
+
+# 默认对连接错误、超时和网关错误的重试次数
+DEFAULT_FETCH_RETRIES = 2
+
+# 重试退避的基准时间和上限（秒）
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 8.0
+
+# 视为瞬时错误、可以重试的HTTP状态码
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+# 默认连续失败多少次后熔断
+DEFAULT_BREAKER_THRESHOLD = 5
+
+# 默认熔断后暂停访问主机的时间（秒）
+DEFAULT_BREAKER_COOLDOWN = 30.0
+
+# 最多跟踪的主机数，超出时丢弃最久未访问的主机
+MAX_TRACKED_HOSTS = 10000
+
+def backoff_delay(attempt: int) -> float:
+    """第attempt次重试（从1开始）前的等待时间，在指数退避的范围内随机取值"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (attempt - 1))))
+
+class HostHealth:
+    """
+    单个主机的往返时间估计和熔断状态
+
+    往返时间按TCP重传超时的方法估计（RFC 6298）：srtt为平滑后的往返时间，rttvar为其平均偏差，
+    超时取srtt + 4 * rttvar。连续失败达到阈值后熔断，冷却期内不再访问该主机；冷却结束后
+    只放行一个试探请求，成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, tracker: "HostHealthTracker", host: str):
+        self.tracker = tracker
+        self.host = host
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_until = 0.0
+
+    def timeout(self, attempt: int, max_timeout: float) -> float:
+        """
+        第attempt次尝试（从0开始）的超时，每次重试加倍，不超过max_timeout
+
+        尚未测得往返时间时从INITIAL_REQUEST_TIMEOUT开始
+        """
+        if self.srtt is None:
+            base = INITIAL_REQUEST_TIMEOUT
+        else:
+            base = max(MIN_REQUEST_TIMEOUT, self.srtt + 4 * self.rttvar)
+        return min(max_timeout, base * (2 ** attempt))
+
+    @property
+    def tripped(self) -> bool:
+        """是否处于熔断冷却期内"""
+        return time.monotonic() < self.open_until
+
+    def allow(self) -> bool:
+        """是否可以向该主机发送请求，熔断冷却结束后每个超时周期只放行一个试探请求"""
+        if not self.open_until:
+            return True
+        now = time.monotonic()
+        if now < self.open_until or now < self.trial_until:
+            return False
+        self.trial_until = now + INITIAL_REQUEST_TIMEOUT
+        return True
+
+    def record_success(self, rtt: float) -> None:
+        """收到响应（以响应头到达计）时更新往返时间估计并解除熔断"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        if self.open_until:
+            logger.info(f"主机 {self.host} 已恢复响应，解除熔断")
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_until = 0.0
+
+    def record_failure(self) -> None:
+        """
+        记录一个失败的请求，连续失败达到阈值或试探请求失败时熔断
+
+        每个请求在重试用尽后只记录一次，超过自适应超时但未超过scan_timeout的尝试不计入
+        """
+        self.failures += 1
+        if self.open_until or self.failures >= self.tracker.threshold:
+            if not self.open_until:
+                logger.warning(
+                    f"主机 {self.host} 连续 {self.failures} 次请求失败，{self.tracker.cooldown:g} 秒内暂停访问"
+                )
+            self.open_until = time.monotonic() + self.tracker.cooldown
+            self.trial_until = 0.0
+
+class HostHealthTracker:
+    """
+    按主机记录往返时间和熔断状态，同一进程内所有扫描共享
+
+    threshold为触发熔断的连续失败次数，cooldown为熔断的持续时间（秒），threshold为0时不熔断
+    """
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        cooldown: float = DEFAULT_BREAKER_COOLDOWN
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._hosts: "OrderedDict[str, HostHealth]" = OrderedDict()
+
+    def configure(self, threshold: int, cooldown: float) -> None:
+        """更新熔断参数，已记录的往返时间保留"""
+        self.threshold = int(threshold) if threshold else float("inf")
+        self.cooldown = float(cooldown)
+
+    def get(self, url: str) -> HostHealth:
+        """返回URL所在主机的状态，不存在时创建"""
+        host = urlparse(url).netloc.lower()
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth(self, host)
+            if len(self._hosts) > MAX_TRACKED_HOSTS:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return health
+
+# 进程内共享的主机状态
+host_health = HostHealthTracker()
@@ -0,0 +1,123 @@
+import aiohttp
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.core.metrics import ScanTimings
+    from app.core.batches import OriginState
+
+logger = logging.getLogger(__name__)
+
+# 默认请求头
+DEFAULT_USER_AGENT = "SecureScout/1.0 Security Scanner"
+
+# 连接池默认参数
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 10
+DEFAULT_DNS_CACHE_TTL = 300
+DEFAULT_KEEPALIVE_TIMEOUT = 30
+
+def create_connector(config: Dict[str, Any]) -> aiohttp.TCPConnector:
+    """按配置创建带连接数限制、长连接和DNS缓存的连接器"""
+    return aiohttp.TCPConnector(
+        limit=config.get("connection_limit", DEFAULT_CONNECTION_LIMIT),
+        limit_per_host=config.get("connection_limit_per_host", DEFAULT_CONNECTION_LIMIT_PER_HOST),
+        ttl_dns_cache=config.get("dns_cache_ttl", DEFAULT_DNS_CACHE_TTL),
+        keepalive_timeout=config.get("keepalive_timeout", DEFAULT_KEEPALIVE_TIMEOUT)
+    )
+
+class ScanSession:
+    """
+    单次扫描使用的会话视图
+
+    每次扫描使用独立的ClientSession和Cookie，底层共享连接池，每个请求叠加本次扫描的自定义请求头；
+    config为本次扫描使用的配置，供fetch_url读取响应大小等限制；
+    cache为本次扫描内检测模块共享的缓存，扫描结束即丢弃；
+    timings为本次扫描的耗时统计，origin_state为批量扫描中同源扫描共享的状态（见OriginState）
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        headers: Optional[Dict[str, str]] = None,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        self.session = session
+        self.headers = dict(headers or {})
+        self.config = config or {}
+        self.cache: Dict[str, Any] = {}
+        self.timings: Optional["ScanTimings"] = None
+        self.origin_state: Optional["OriginState"] = None
+
+    def _merge_headers(self, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        merged = dict(self.headers)
+        if headers:
+            merged.update(headers)
+        return merged
+
+    def request(self, method: str, url: str, **kwargs: Any):
+        kwargs["headers"] = self._merge_headers(kwargs.get("headers"))
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any):
+        return self.request("GET", url, **kwargs)
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+class SessionManager:
+    """
+    应用级的HTTP会话管理器
+
+    在FastAPI的lifespan中启动，所有扫描共享同一个连接池，批量扫描同一主机时
+    复用TCP/TLS连接和DNS解析结果。每次扫描仍使用独立的ClientSession和CookieJar，
+    一次扫描中服务器设置的Cookie（包括使用自定义认证头的扫描）不会发送给其他扫描。
+    未启动时（如命令行运行）每次扫描使用临时连接池。
+    """
+
+    def __init__(self):
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def started(self) -> bool:
+        return (
+            self._connector is not None
+            and not self._connector.closed
+            and self._loop is asyncio.get_running_loop()
+        )
+
+    async def start(self, config: Dict[str, Any]) -> None:
+        if self.started:
+            return
+        self._connector = create_connector(config)
+        self._loop = asyncio.get_running_loop()
+        logger.info("共享HTTP连接池已启动")
+
+    async def close(self) -> None:
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+            self._loop = None
+
+    @asynccontextmanager
+    async def scan_session(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        config: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[ScanSession]:
+        """获取一次扫描使用的会话，headers叠加在默认请求头之上"""
+        shared = self.started
+        async with aiohttp.ClientSession(
+            connector=self._connector if shared else create_connector(config or {}),
+            connector_owner=not shared,
+            cookie_jar=aiohttp.CookieJar(),
+            headers={"User-Agent": DEFAULT_USER_AGENT}
+        ) as session:
+            yield ScanSession(session, headers, config)
+
+# 应用共用的HTTP会话管理器
+session_manager = SessionManager()
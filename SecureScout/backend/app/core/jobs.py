@@ -0,0 +1,389 @@
+import os
+import time
+import socket
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Set
+
+from app.core.storage import ScanResultStore, result_store, encode_result, decode_result
+from app.core.executor import run_blocking
+from app.core.batches import origin_of
+
+logger = logging.getLogger(__name__)
+
+# 队列为空时工作协程的最长等待时间（秒），超时后重新检查队列
+IDLE_POLL_INTERVAL = 5.0
+
+# 任务租约的默认时长（秒），工作进程每隔三分之一租约发送一次心跳续约
+DEFAULT_JOB_LEASE_SECONDS = 30
+
+# 超过这段时间（秒）没有心跳的工作进程记录会被删除
+WORKER_RECORD_TTL = 24 * 3600
+
+def default_worker_id() -> str:
+    """当前进程的工作进程ID：主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class ScanJobQueue:
+    """
+    持久化的扫描任务队列，保存在扫描结果数据库的scan_jobs表中
+
+    队列中只保留pending和running两种状态的任务，任务结束后删除。多个进程（API进程和
+    app.worker工作进程）可以同时消费同一个队列：取出任务时获得有期限的租约，执行期间
+    通过心跳续约并上报进度；工作进程崩溃或失联时租约过期，任务会被其他工作进程重新取出。
+    正常退出的工作进程会立即释放租约。
+    """
+
+    def __init__(self, store: ScanResultStore = result_store):
+        self.store = store
+
+    def enqueue(self, jobs: List[Dict[str, Any]]) -> None:
+        """
+        在一个事务中加入多个任务
+
+        每个任务包含id、params（传给扫描函数的参数）、record（扫描状态记录）和可选的priority，
+        任务按params中url的源站记录，用于限制同一源站同时运行的扫描数
+        """
+        created_at = datetime.now().isoformat()
+        with self.store.transaction() as conn:
+            for job in jobs:
+                url = job["params"].get("url")
+                conn.execute(
+                    "INSERT INTO scan_jobs (id, priority, status, origin, params, record, created_at) "
+                    "VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+                    (
+                        job["id"],
+                        job.get("priority") or 0,
+                        origin_of(url) if url else None,
+                        json.dumps(job["params"], ensure_ascii=False),
+                        json.dumps(job["record"], ensure_ascii=False),
+                        created_at
+                    )
+                )
+
+    def claim(
+        self,
+        worker_id: str,
+        lease_seconds: float = DEFAULT_JOB_LEASE_SECONDS,
+        max_per_origin: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        取出一个待执行任务或租约已过期的运行中任务，标记为running并由worker_id持有租约
+
+        按优先级从高到低选择，同一优先级中优先选择当前运行扫描最少的源站，再按加入顺序。
+        指定max_per_origin时跳过已有这么多扫描在运行的源站，避免批量扫描集中访问同一主机
+        """
+        now = time.time()
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                "SELECT j.id, j.params, j.record, j.status, j.worker_id, j.attempts FROM scan_jobs j "
+                "LEFT JOIN (SELECT origin, COUNT(*) AS running FROM scan_jobs "
+                "WHERE status = 'running' AND lease_expires >= ? GROUP BY origin) r ON r.origin = j.origin "
+                "WHERE (j.status = 'pending' OR (j.status = 'running' AND (j.lease_expires IS NULL OR j.lease_expires < ?))) "
+                "AND (? IS NULL OR COALESCE(r.running, 0) < ?) "
+                "ORDER BY j.priority DESC, COALESCE(r.running, 0), j.seq LIMIT 1",
+                (now, now, max_per_origin, max_per_origin)
+            ).fetchone()
+            if not row:
+                return None
+            job_id, params, record, status, previous_worker, attempts = row
+            record = decode_result(record)
+            record["status"] = "in_progress"
+            conn.execute(
+                "UPDATE scan_jobs SET status = 'running', worker_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1, record = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, encode_result(record), job_id)
+            )
+        if status == "running":
+            logger.warning(f"工作进程 {previous_worker} 的任务 {job_id} 租约已过期，由 {worker_id} 重新执行")
+        return {"id": job_id, "params": json.loads(params), "record": record, "attempts": attempts + 1}
+
+    def heartbeat(
+        self,
+        worker_id: str,
+        records: Dict[str, Optional[Dict[str, Any]]],
+        lease_seconds: float = DEFAULT_JOB_LEASE_SECONDS,
+        slots: int = 0
+    ) -> Dict[str, str]:
+        """
+        工作进程心跳：续约持有的任务并保存最新的扫描状态记录
+
+        records为{任务ID: 扫描状态记录}，记录为None时只续约。返回需要停止的任务
+        {任务ID: 原因}，原因为"cancel"（已请求取消）或"lost"（租约已被其他工作进程取得）
+        """
+        now = time.time()
+        stop: Dict[str, str] = {}
+        with self.store.transaction() as conn:
+            for job_id, record in records.items():
+                row = conn.execute(
+                    "SELECT worker_id, cancel_requested FROM scan_jobs WHERE id = ? AND status = 'running'",
+                    (job_id,)
+                ).fetchone()
+                if not row or row[0] != worker_id:
+                    stop[job_id] = "lost"
+                    continue
+                if row[1]:
+                    stop[job_id] = "cancel"
+                if record is None:
+                    conn.execute("UPDATE scan_jobs SET lease_expires = ? WHERE id = ?", (now + lease_seconds, job_id))
+                else:
+                    conn.execute(
+                        "UPDATE scan_jobs SET lease_expires = ?, record = ? WHERE id = ?",
+                        (now + lease_seconds, encode_result(record), job_id)
+                    )
+            host, _, pid = worker_id.rpartition(":")
+            conn.execute(
+                "INSERT INTO scan_workers (id, host, pid, slots, running, started_at, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET slots = excluded.slots, running = excluded.running, "
+                "heartbeat_at = excluded.heartbeat_at",
+                (worker_id, host or worker_id, int(pid) if pid.isdigit() else 0, slots, len(records),
+                 datetime.now().isoformat(), now)
+            )
+            conn.execute("DELETE FROM scan_workers WHERE heartbeat_at < ?", (now - WORKER_RECORD_TTL,))
+        return stop
+
+    def release(self, worker_id: str) -> int:
+        """工作进程退出时把持有的任务放回队列，返回放回的任务数"""
+        with self.store.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, record FROM scan_jobs WHERE status = 'running' AND worker_id = ?", (worker_id,)
+            ).fetchall()
+            for job_id, record in rows:
+                record = decode_result(record)
+                record["status"] = "pending"
+                conn.execute(
+                    "UPDATE scan_jobs SET status = 'pending', worker_id = NULL, lease_expires = NULL, record = ? "
+                    "WHERE id = ?",
+                    (encode_result(record), job_id)
+                )
+            conn.execute("DELETE FROM scan_workers WHERE id = ?", (worker_id,))
+        return len(rows)
+
+    def remove(self, job_id: str, status: Optional[str] = None, worker_id: Optional[str] = None) -> bool:
+        """删除任务，指定status时只删除该状态的任务，指定worker_id时只删除该工作进程持有的任务"""
+        clauses, params = ["id = ?"], [job_id]
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if worker_id:
+            clauses.append("worker_id = ?")
+            params.append(worker_id)
+        with self.store.transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM scan_jobs WHERE {' AND '.join(clauses)}", params)
+        return cursor.rowcount > 0
+
+    def request_cancel(self, job_id: str) -> bool:
+        """请求取消运行中的任务，持有租约的工作进程在下次心跳时停止扫描"""
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE scan_jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+        return cursor.rowcount > 0
+
+    def get_record(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """返回队列中任务的扫描状态记录，运行中的任务附带执行它的worker_id"""
+        row = self.store.conn.execute(
+            "SELECT record, status, worker_id FROM scan_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        record = decode_result(row[0])
+        if row[1] == "running":
+            record["worker_id"] = row[2]
+        return record
+
+    def list_records(self) -> List[Dict[str, Any]]:
+        """按执行顺序返回队列中所有任务的扫描状态记录"""
+        rows = self.store.conn.execute(
+            "SELECT record, status, worker_id FROM scan_jobs ORDER BY priority DESC, seq"
+        ).fetchall()
+        records = []
+        for record, status, worker_id in rows:
+            record = decode_result(record)
+            if status == "running":
+                record["worker_id"] = worker_id
+            records.append(record)
+        return records
+
+    def list_workers(self, lease_seconds: float = DEFAULT_JOB_LEASE_SECONDS) -> List[Dict[str, Any]]:
+        """返回已登记的工作进程，alive表示在一个租约时长内发送过心跳"""
+        now = time.time()
+        rows = self.store.conn.execute(
+            "SELECT id, host, pid, slots, running, started_at, heartbeat_at FROM scan_workers ORDER BY started_at"
+        ).fetchall()
+        return [
+            {
+                "id": worker_id,
+                "host": host,
+                "pid": pid,
+                "slots": slots,
+                "running": running,
+                "started_at": started_at,
+                "last_heartbeat": datetime.fromtimestamp(heartbeat_at).isoformat(),
+                "alive": heartbeat_at >= now - lease_seconds
+            }
+            for worker_id, host, pid, slots, running, started_at, heartbeat_at in rows
+        ]
+
+class ScanScheduler:
+    """
+    固定数量工作协程的扫描调度器
+
+    工作协程从持久化队列中按优先级取出任务，通过runner(scan_id, **params)执行，
+    同时运行的扫描数不超过workers。取出任务时调用on_claim(job)，心跳时用snapshot(scan_id)
+    取得运行中任务的最新状态记录写回队列，供其他进程查询进度。可以取消排队或运行中的任务，
+    运行在其他工作进程中的任务通过队列通知其停止。
+    """
+
+    def __init__(
+        self,
+        queue: ScanJobQueue,
+        runner: Callable[..., Awaitable[None]],
+        worker_id: Optional[str] = None,
+        lease_seconds: float = DEFAULT_JOB_LEASE_SECONDS,
+        on_claim: Optional[Callable[[Dict[str, Any]], None]] = None,
+        snapshot: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+        max_per_origin: Optional[int] = None
+    ):
+        self.queue = queue
+        self.runner = runner
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_per_origin = max_per_origin
+        self.on_claim = on_claim
+        self.snapshot = snapshot
+        self.workers = 0
+        self.running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(
+        self,
+        workers: int,
+        worker_id: Optional[str] = None,
+        lease_seconds: Optional[float] = None,
+        max_per_origin: Optional[int] = None
+    ) -> None:
+        """
+        启动工作协程和心跳
+
+        workers为0时只入队不执行，由app.worker工作进程执行任务；
+        其他进程中断时遗留的任务在租约过期后被重新取出。max_per_origin为同一源站
+        同时运行的扫描数上限（所有工作进程合计），0或None表示不限制
+        """
+        if worker_id:
+            self.worker_id = worker_id
+        if lease_seconds:
+            self.lease_seconds = lease_seconds
+        if max_per_origin is not None:
+            self.max_per_origin = max_per_origin or None
+        self.workers = max(0, int(workers))
+        self._wakeup = asyncio.Event()
+        if not self.workers:
+            return
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+        logger.info(f"扫描调度器 {self.worker_id} 已启动，并发数 {self.workers}")
+
+    async def stop(self) -> None:
+        """停止调度器，运行中的任务放回队列，由下一个可用的工作进程继续执行"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._tasks:
+            released = await run_blocking(self.queue.release, self.worker_id)
+            if released:
+                logger.info(f"已把 {released} 个未完成的扫描任务放回队列")
+        self._tasks = []
+
+    def notify(self) -> None:
+        """有新任务加入时唤醒空闲的工作协程"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return job_id in self._cancel_requested
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """
+        取消任务
+
+        返回"pending"表示取消了排队中的任务，"running"表示已通知运行中的任务停止
+        （在其他工作进程中运行的任务在其下次心跳时停止），任务不存在时返回None
+        """
+        if await run_blocking(self.queue.remove, job_id, "pending"):
+            return "pending"
+
+        task = self.running.get(job_id)
+        if task is not None:
+            self._cancel_requested.add(job_id)
+            task.cancel()
+            return "running"
+        if await run_blocking(self.queue.request_cancel, job_id):
+            return "running"
+        return None
+
+    async def heartbeat(self) -> None:
+        """续约运行中的任务并上报进度，停止已被取消或已失去租约的任务"""
+        records = {
+            job_id: self.snapshot(job_id) if self.snapshot else None
+            for job_id in list(self.running)
+        }
+        stop = await run_blocking(self.queue.heartbeat, self.worker_id, records, self.lease_seconds, self.workers)
+        for job_id, reason in stop.items():
+            task = self.running.get(job_id)
+            if task is None or task.done():
+                continue
+            if reason == "cancel":
+                self._cancel_requested.add(job_id)
+            else:
+                logger.warning(f"扫描任务 {job_id} 的租约已被其他工作进程取得，停止本地执行")
+            task.cancel()
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"发送工作进程心跳时出错: {str(e)}")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await run_blocking(self.queue.claim, self.worker_id, self.lease_seconds, self.max_per_origin)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), IDLE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id = job["id"]
+            if self.on_claim:
+                self.on_claim(job)
+            task = asyncio.create_task(self.runner(job_id, **job["params"]))
+            self.running[job_id] = task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():
+                    # 调度器停止：取消扫描，任务保留为running，由stop()放回队列
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    raise
+            except Exception as e:
+                logger.error(f"扫描任务 {job_id} 执行出错: {str(e)}")
+            finally:
+                self.running.pop(job_id, None)
+
+            self._cancel_requested.discard(job_id)
+            # 只删除仍由本进程持有的任务，租约已被其他工作进程取得时由对方完成
+            await run_blocking(self.queue.remove, job_id, None, self.worker_id)
+            # 该源站空出一个名额，唤醒因源站并发上限而空闲的工作协程
+            self.notify()
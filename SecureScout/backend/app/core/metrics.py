@@ -0,0 +1,303 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 延迟直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    """指标基类，按标签值分别计数，子类实现samples()输出各标签值的样本行"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """返回Prometheus文本格式的样本行"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+class Gauge(Metric):
+    """
+    可增可减的当前值
+
+    指定callback时在导出时调用，返回{标签值元组: 数值}，用于导出由其他模块维护的状态
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                items = list(self.callback().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+class Histogram(Metric):
+    """按分桶累计的分布，导出_bucket、_sum和_count"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 各分桶的计数（最后一个为+Inf），随后是总和和总数
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """进程内的指标注册表，render()输出Prometheus文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, callback))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+# 应用共用的指标注册表
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "securescout_http_requests_total", "扫描发出的HTTP请求数", ["status"]
+)
+HTTP_RETRIES = registry.counter(
+    "securescout_http_retries_total", "因连接错误、超时或网关错误重试的HTTP请求数"
+)
+HTTP_SKIPPED = registry.counter(
+    "securescout_http_skipped_total", "目标主机熔断而未发送的HTTP请求数"
+)
+HTTP_RESPONSE_BYTES = registry.counter(
+    "securescout_http_response_bytes_total", "下载的响应体字节数"
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "securescout_http_request_duration_seconds", "HTTP请求耗时（含下载响应体）"
+)
+PARSE_SECONDS = registry.histogram(
+    "securescout_parse_cpu_seconds", "解析单个页面的CPU时间"
+)
+DETECTOR_SECONDS = registry.histogram(
+    "securescout_detector_duration_seconds", "单个检测模块处理一个页面的耗时", ["module"]
+)
+DETECTOR_CPU_SECONDS = registry.counter(
+    "securescout_detector_cpu_seconds_total", "检测模块累计CPU时间（探测类模块为墙钟时间）", ["module"]
+)
+PAGES = registry.counter(
+    "securescout_pages_total", "已完成分析的页面数", ["source"]
+)
+PERSIST_SECONDS = registry.histogram(
+    "securescout_persist_duration_seconds", "保存扫描结果的耗时"
+)
+CRAWL_QUEUE_DEPTH = registry.gauge(
+    "securescout_crawl_queue_depth", "所有扫描中等待抓取的页面数"
+)
+
+class ScanTimings:
+    """
+    单次扫描的耗时统计
+
+    记录时同时更新进程级的Prometheus指标；to_dict()的结果保存在扫描结果的timings中
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.fetch_seconds = 0.0
+        self.fetch_max_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.pages = 0
+        self.reused_pages = 0
+        self.max_queue_depth = 0
+        self.modules: Dict[str, Dict[str, float]] = {}
+
+    def record_fetch(self, seconds: float, nbytes: int, status: Optional[int]) -> None:
+        self.requests += 1
+        self.bytes += nbytes
+        self.fetch_seconds += seconds
+        self.fetch_max_seconds = max(self.fetch_max_seconds, seconds)
+        if status is None:
+            self.errors += 1
+        HTTP_REQUESTS.inc(status=f"{status // 100}xx" if status else "error")
+        HTTP_RESPONSE_BYTES.inc(nbytes)
+        HTTP_REQUEST_SECONDS.observe(seconds)
+
+    def record_retry(self) -> None:
+        self.retries += 1
+        HTTP_RETRIES.inc()
+
+    def record_skip(self) -> None:
+        """记录一个因目标主机熔断而放弃的请求"""
+        self.skipped += 1
+        HTTP_SKIPPED.inc()
+
+    def record_analysis(self, timings: Dict[str, Dict[str, float]]) -> None:
+        """记录analyze_page返回的解析和各页面检测模块的CPU时间"""
+        parse = timings.get("parse", 0.0)
+        self.parse_seconds += parse
+        PARSE_SECONDS.observe(parse)
+        for module, seconds in timings.get("modules", {}).items():
+            self.record_module(module, seconds)
+
+    def record_module(self, module: str, seconds: float) -> None:
+        entry = self.modules.setdefault(module, {"calls": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        DETECTOR_SECONDS.observe(seconds, module=module)
+        DETECTOR_CPU_SECONDS.inc(seconds, module=module)
+
+    def record_page(self, reused: bool) -> None:
+        self.pages += 1
+        if reused:
+            self.reused_pages += 1
+        PAGES.inc(source="reused" if reused else "analyzed")
+
+    def record_queue_depth(self, depth: int) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "pages": self.pages,
+            "reused_pages": self.reused_pages,
+            "requests": self.requests,
+            "request_errors": self.errors,
+            "retries": self.retries,
+            "skipped_requests": self.skipped,
+            "bytes": self.bytes,
+            "fetch_seconds": round(self.fetch_seconds, 4),
+            "fetch_avg_ms": round(self.fetch_seconds * 1000 / self.requests, 3) if self.requests else 0.0,
+            "fetch_max_ms": round(self.fetch_max_seconds * 1000, 3),
+            "parse_cpu_seconds": round(self.parse_seconds, 4),
+            "modules": {
+                module: {"calls": int(entry["calls"]), "seconds": round(entry["seconds"], 4)}
+                for module, entry in self.modules.items()
+            },
+            "max_queue_depth": self.max_queue_depth
+        }
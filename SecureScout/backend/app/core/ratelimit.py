@@ -0,0 +1,90 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, AsyncIterator
+from urllib.parse import urlparse
+
+# 默认每个主机每秒最多发送的探测请求数
+DEFAULT_PROBE_RATE_LIMIT = 10.0
+
+# 默认每个主机同时进行中的探测请求上限
+DEFAULT_PROBE_MAX_IN_FLIGHT = 4
+
+class TokenBucket:
+    """令牌桶：按rate速率补充令牌，桶容量为burst"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """取出一个令牌，令牌不足时等待补充"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    """
+    按主机限制请求速率和并发数
+
+    每个主机拥有独立的令牌桶和信号量，同一进程内所有扫描共享，
+    避免对同一目标主机发起过多探测请求。rate为0或None时不限速。
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = DEFAULT_PROBE_RATE_LIMIT,
+        max_in_flight: int = DEFAULT_PROBE_MAX_IN_FLIGHT
+    ):
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def configure(self, rate: Optional[float], max_in_flight: int) -> None:
+        """更新限速参数，参数变化时重建各主机的令牌桶和信号量"""
+        max_in_flight = max(1, int(max_in_flight))
+        if rate == self.rate and max_in_flight == self.max_in_flight:
+            return
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self._buckets.clear()
+        self._semaphores.clear()
+
+    @asynccontextmanager
+    async def acquire(self, url: str) -> AsyncIterator[None]:
+        """为目标URL所在主机获取一个请求配额"""
+        host = urlparse(url).netloc.lower()
+
+        # 信号量绑定事件循环，换了事件循环（如命令行多次运行）时重建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._buckets.clear()
+            self._semaphores.clear()
+
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_in_flight)
+
+        async with semaphore:
+            if self.rate:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    bucket = self._buckets[host] = TokenBucket(float(self.rate))
+                await bucket.acquire()
+            yield
+
+# 进程内共享的探测限速器
+host_limiter = HostRateLimiter()
@@ -0,0 +1,59 @@
+import importlib
+import logging
+import pkgutil
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 检测模块类型：page为基于已解析页面的静态检测，probe为需要发送探测请求的异步检测
+PAGE_DETECTOR = "page"
+PROBE_DETECTOR = "probe"
+
+# 检测模块所在的包，内置检测模块和放在app/detectors/目录下的插件在第一次查找检测模块时导入
+PLUGIN_PACKAGE = "app.detectors"
+
+class Detector:
+    """
+    已注册的检测模块
+
+    page类型的函数签名为func(url, page, headers, rules, vulnerabilities)，
+    probe类型为async func(session, url, rules, vulnerabilities)
+    """
+
+    def __init__(self, name: str, func: Callable, kind: str):
+        self.name = name
+        self.func = func
+        self.kind = kind
+
+_detectors: Dict[str, Detector] = {}
+_plugins_loaded = False
+
+def register_detector(name: str, kind: str = PAGE_DETECTOR) -> Callable[[Callable], Callable]:
+    """注册检测模块的装饰器，name即扫描请求modules中使用的模块名"""
+    def decorator(func: Callable) -> Callable:
+        if name in _detectors:
+            logger.warning(f"检测模块 {name} 被重复注册，使用 {func.__module__}.{func.__name__}")
+        _detectors[name] = Detector(name, func, kind)
+        return func
+    return decorator
+
+def load_plugins() -> None:
+    """导入app/detectors包中的所有模块，模块中的register_detector会完成注册，单个模块出错时跳过"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    package = importlib.import_module(PLUGIN_PACKAGE)
+    _plugins_loaded = True
+    for module_info in pkgutil.iter_modules(package.__path__, f"{PLUGIN_PACKAGE}."):
+        try:
+            importlib.import_module(module_info.name)
+        except Exception as e:
+            logger.error(f"加载检测插件 {module_info.name} 时出错: {str(e)}")
+
+def get_detector(name: str) -> Optional[Detector]:
+    load_plugins()
+    return _detectors.get(name)
+
+def list_detectors() -> List[Detector]:
+    load_plugins()
+    return list(_detectors.values())
@@ -0,0 +1,129 @@
+import re
+import threading
+from typing import List, Dict, Any, Optional
+
+from app.core.settings import content_version
+
+# 可选的Aho-Corasick实现，未安装时使用合并后的正则表达式
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 最多缓存的规则集版本数
+MAX_CACHED_RULESETS = 8
+
+class LiteralMatcher:
+    """
+    多字符串匹配器
+
+    把一组字面量一次性编译为Aho-Corasick自动机（安装了pyahocorasick时）或单个正则表达式，
+    匹配时只扫描一遍文本，耗时与文本长度相关，而不是文本长度×模式数量
+    """
+
+    def __init__(self, patterns: List[str], ignore_case: bool = False):
+        self.patterns = [pattern for pattern in patterns if pattern]
+        self.ignore_case = ignore_case
+        self._automaton = None
+        self._regex: Optional[re.Pattern] = None
+
+        if not self.patterns:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for pattern in self.patterns:
+                key = pattern.lower() if ignore_case else pattern
+                self._automaton.add_word(key, pattern)
+            self._automaton.make_automaton()
+        else:
+            # 长的模式放在前面，保证返回的是最长的匹配
+            alternatives = sorted(set(self.patterns), key=len, reverse=True)
+            self._regex = re.compile(
+                "|".join(re.escape(pattern) for pattern in alternatives),
+                re.I if ignore_case else 0
+            )
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def search(self, text: str) -> Optional[str]:
+        """返回文本中出现的第一个模式，没有时返回None"""
+        if not self.patterns or not text:
+            return None
+        if self._automaton is not None:
+            haystack = text.lower() if self.ignore_case else text
+            for _end, pattern in self._automaton.iter(haystack):
+                return pattern
+            return None
+        match = self._regex.search(text)
+        return match.group(0) if match else None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # 自动机不能pickle，跨进程传递时只传模式，在目标进程重新编译
+        return {"patterns": self.patterns, "ignore_case": self.ignore_case}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["patterns"], state["ignore_case"])
+
+class CompiledRule:
+    """漏洞库中一种漏洞类型编译后的规则"""
+
+    def __init__(self, name: str, entry: Dict[str, Any]):
+        self.name = name
+        self.entry = entry
+        self.severity = entry.get("severity")
+        self.description = entry.get("description")
+        self.patterns: List[str] = list(entry.get("patterns", []))
+        self.matcher = LiteralMatcher(self.patterns)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.entry.get(key, default)
+
+class RuleSet:
+    """
+    编译后的漏洞库
+
+    同一版本的漏洞库只编译一次；检测模块通过rules[漏洞类型]取得CompiledRule
+    """
+
+    def __init__(self, library: Dict[str, Any], version: str):
+        self.library = library
+        self.version = version
+        self.rules: Dict[str, CompiledRule] = {
+            name: CompiledRule(name, entry)
+            for name, entry in library.items()
+            if isinstance(entry, dict)
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rules
+
+    def __getitem__(self, name: str) -> CompiledRule:
+        return self.rules[name]
+
+    def get(self, name: str) -> Optional[CompiledRule]:
+        return self.rules.get(name)
+
+def library_version(library: Dict[str, Any]) -> str:
+    """根据漏洞库内容计算版本号，与library_cache.version一致"""
+    return content_version(library)
+
+_cache: Dict[str, RuleSet] = {}
+_cache_lock = threading.Lock()
+
+def compile_rules(library: Dict[str, Any], version: Optional[str] = None) -> RuleSet:
+    """编译漏洞库，同一版本只编译一次"""
+    if version is None:
+        version = library_version(library)
+    with _cache_lock:
+        ruleset = _cache.get(version)
+        if ruleset is None:
+            if len(_cache) >= MAX_CACHED_RULESETS:
+                _cache.clear()
+            ruleset = _cache[version] = RuleSet(library, version)
+        return ruleset
+
+def invalidate_rules() -> None:
+    """漏洞库被修改后清空已编译的规则"""
+    with _cache_lock:
+        _cache.clear()
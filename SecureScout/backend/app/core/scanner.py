@@ -1,385 +1,665 @@
 import aiohttp
 import asyncio
-import json
-import re
+import codecs
+import hashlib
+import time
 import logging
-from pathlib import Path
-from typing import List, Dict, Any, Optional, Set
-from urllib.parse import urlparse, urljoin, urlunparse
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable
+from urllib.parse import urljoin, urldefrag
+from app.core.document import ParsedPage
+from app.core.executor import run_blocking, run_cpu
+from app.core.http import ScanSession, session_manager
+from app.core.rules import RuleSet, compile_rules
+from app.core.settings import config_cache, library_cache, content_version
+from app.core.cache import (
+    response_cache, cache_key, DEFAULT_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_MAX_BYTES
+)
+from app.core.urls import CrawlScope, VisitedIndex, DEFAULT_MAX_QUERY_VARIANTS
+from app.core.metrics import ScanTimings, CRAWL_QUEUE_DEPTH
+from app.core.findings import Finding, FindingList, findings_to_dicts
+from app.core.batches import OriginState, batch_registry, DEFAULT_PROBE_BUDGET_PER_ORIGIN
+from app.core.registry import Detector, get_detector, PAGE_DETECTOR, PROBE_DETECTOR
+from app.core.ratelimit import (
+    host_limiter, DEFAULT_PROBE_RATE_LIMIT, DEFAULT_PROBE_MAX_IN_FLIGHT
+)
+from app.core.health import (
+    host_health, backoff_delay, RETRY_STATUSES, DEFAULT_SCAN_TIMEOUT, DEFAULT_FETCH_RETRIES,
+    DEFAULT_BREAKER_THRESHOLD, DEFAULT_BREAKER_COOLDOWN
+)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 扫描进度回调，参数为(事件名, 事件数据)
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+# 默认扫描模块
+DEFAULT_SCAN_MODULES = ["sql_injection", "xss", "csrf", "file_upload"]
+
+# 默认单次扫描最多访问的页面数
+DEFAULT_MAX_PAGES = 50
+
+# 默认爬虫并发数
+DEFAULT_CONCURRENT_SCANS = 5
+
+# 单个响应默认最多读取的字节数
+DEFAULT_MAX_RESPONSE_BYTES = 5 * 1024 * 1024
+
+# 默认需要下载分析的内容类型，以/结尾的项按前缀匹配
+DEFAULT_FETCH_CONTENT_TYPES = ["text/", "application/xhtml+xml", "application/xml", "application/json"]
+
+# 流式读取响应的块大小
+FETCH_CHUNK_SIZE = 64 * 1024
+
+def load_scan_config() -> Dict[str, Any]:
+    """读取扫描配置（带缓存，返回值为共享对象，不要修改），不存在时返回空配置，格式无效时抛出JsonFileError"""
+    return config_cache.get() or {}
+
+def load_vulnerability_library() -> Dict[str, Any]:
+    """读取漏洞库（带缓存，返回值为共享对象，不要修改），不存在时返回空漏洞库，格式无效时抛出JsonFileError"""
+    return library_cache.get() or {}
+
 async def scan_url_for_vulnerabilities(
     url: str, 
     modules: Optional[List[str]] = None,
     depth: int = 1,
-    headers: Optional[Dict[str, str]] = None
+    headers: Optional[Dict[str, str]] = None,
+    max_pages: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    baseline: Optional[Dict[str, Any]] = None,
+    batch_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
-    对URL进行安全扫描，检测可能的漏洞
+    对URL进行安全扫描，返回去重后的字典格式漏洞记录，参数见scan_url_findings
     """
+    return findings_to_dicts(
+        await scan_url_findings(url, modules, depth, headers, max_pages, progress, baseline, batch_id)
+    )
+
+async def scan_url_findings(
+    url: str, 
+    modules: Optional[List[str]] = None,
+    depth: int = 1,
+    headers: Optional[Dict[str, str]] = None,
+    max_pages: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    baseline: Optional[Dict[str, Any]] = None,
+    batch_id: Optional[str] = None
+) -> List[Finding]:
+    """
+    对URL进行安全扫描，检测可能的漏洞，返回去重后的漏洞记录（Finding，内存占用较小）
+
+    depth为爬行层数（1表示只扫描起始页面），max_pages为本次扫描最多访问的页面数，
+    未指定时使用配置文件中的max_pages。progress(event, data)在扫描开始（start，包含使用的
+    配置、漏洞库版本和检测模块）、每个页面扫描完成（page，包含页面内容哈希）、每发现一个漏洞（finding）和
+    扫描结束（timings，包含请求、解析和各检测模块的耗时统计）时被调用；目标主机熔断导致
+    部分请求未发送时，最后还有一个partial事件，包含未发送的请求数，扫描结果不完整。
+    baseline为上次扫描的结果，内容哈希未变化的页面直接沿用上次的漏洞，不再执行检测模块。
+    finding事件的数据为字典格式的漏洞，完全相同的重复漏洞只报告一次。
+    batch_id为所属批量扫描的ID，同一批次中同一源站的扫描共享已爬行页面和探测预算（见OriginState）
+    """
+    config, config_version = await run_blocking(config_cache.snapshot)
+    config = config or {}
+    
     # 如果未指定模块，则加载默认模块
     if not modules:
-        config_file = Path("data/config.json")
-        if config_file.exists():
-            with open(config_file, "r") as f:
-                config = json.load(f)
-                modules = config.get("default_scan_modules", ["sql_injection", "xss", "csrf", "file_upload"])
-        else:
-            modules = ["sql_injection", "xss", "csrf", "file_upload"]
+        modules = config.get("default_scan_modules", DEFAULT_SCAN_MODULES)
     
-    # 加载漏洞库
-    vulns_file = Path("data/vulnerabilities.json")
-    if vulns_file.exists():
-        with open(vulns_file, "r") as f:
-            vulnerability_library = json.load(f)
-    else:
-        vulnerability_library = {}
+    if max_pages is None:
+        max_pages = config.get("max_pages", DEFAULT_MAX_PAGES)
+    workers = config.get("concurrent_scans", DEFAULT_CONCURRENT_SCANS)
     
-    # 创建请求头
-    if not headers:
-        headers = {
-            "User-Agent": "SecureScout/1.0 Security Scanner"
-        }
+    # 按配置调整主机探测限速
+    host_limiter.configure(
+        config.get("probe_rate_limit", DEFAULT_PROBE_RATE_LIMIT),
+        config.get("probe_max_in_flight", DEFAULT_PROBE_MAX_IN_FLIGHT)
+    )
+    host_health.configure(
+        config.get("circuit_breaker_threshold", DEFAULT_BREAKER_THRESHOLD),
+        config.get("circuit_breaker_cooldown", DEFAULT_BREAKER_COOLDOWN)
+    )
+    
+    # 批量扫描中同一源站共享的爬行和探测状态
+    shared = None
+    if batch_id:
+        budget = config.get("probe_budget_per_origin", DEFAULT_PROBE_BUDGET_PER_ORIGIN)
+        shared = batch_registry.get(batch_id, url, budget or None)
+    
+    # 加载漏洞库并编译规则，同一版本的漏洞库只编译一次
+    library, library_version = await run_blocking(library_cache.snapshot)
+    if not library:
+        # 没有规则时所有检测模块都不会执行，不能把扫描当作未发现漏洞
+        raise ValueError(f"漏洞库 {library_cache.path} 不存在或为空，无法执行检测")
+    rules = compile_rules(library, library_version)
+    missing = [module for module in modules if module not in rules]
+    if missing:
+        logger.warning(f"漏洞库中没有以下检测模块的规则，这些模块不会执行: {', '.join(missing)}")
+    
+    # 记录本次扫描使用的配置、漏洞库版本和实际执行的检测模块
+    if progress:
+        progress("start", {"config_version": config_version, "library_version": rules.version, "modules": modules})
     
     # 存储扫描结果
-    vulnerabilities = []
+    vulnerabilities = FindingList()
+    timings = ScanTimings()
     
     try:
-        # 使用aiohttp创建会话
-        async with aiohttp.ClientSession(headers=headers) as session:
+        # 使用共享连接池，自定义请求头叠加在默认请求头之上
+        async with session_manager.scan_session(headers, config) as session:
+            session.timings = timings
+            session.origin_state = shared
+            
             # 获取初始响应
-            response_data = await fetch_url(session, url)
+            response_data = await fetch_page(session, url)
             
             if not response_data:
-                return [{"type": "error", "url": url, "description": "无法访问目标URL", "severity": "中"}]
-            
-            # 获取网站的所有链接（用于爬行）
-            links = extract_links(url, response_data["text"])
+                return [Finding("error", url, "无法访问目标URL", "中")]
             
-            # 检测主页面的漏洞
-            await detect_vulnerabilities(
+            await crawl(
                 session=session,
-                url=url,
-                response_data=response_data,
+                start_url=url,
+                start_response=response_data,
+                depth=depth,
+                max_pages=max_pages,
+                workers=workers,
                 modules=modules,
-                vulnerability_library=vulnerability_library,
-                vulnerabilities=vulnerabilities
+                rules=rules,
+                vulnerabilities=vulnerabilities,
+                html_parser=config.get("html_parser"),
+                progress=progress,
+                scope=CrawlScope(
+                    url,
+                    include=config.get("scope_include"),
+                    exclude=config.get("scope_exclude"),
+                    ignored_params=config.get("ignored_query_params")
+                ),
+                max_query_variants=config.get("max_query_variants", DEFAULT_MAX_QUERY_VARIANTS),
+                previous=baseline_pages(baseline, modules, rules.version),
+                shared=shared
             )
-            
-            # 如果深度大于1，继续扫描链接页面
-            if depth > 1 and links:
-                visited = {url}
-                for link in links[:min(10, len(links))]:  # 限制扫描链接数量
-                    if link in visited:
-                        continue
-                    
-                    visited.add(link)
-                    
-                    logger.info(f"扫描链接: {link}")
-                    link_response = await fetch_url(session, link)
-                    
-                    if link_response:
-                        await detect_vulnerabilities(
-                            session=session,
-                            url=link,
-                            response_data=link_response,
-                            modules=modules,
-                            vulnerability_library=vulnerability_library,
-                            vulnerabilities=vulnerabilities
-                        )
     
     except Exception as e:
         logger.error(f"扫描过程中发生错误: {str(e)}")
-        vulnerabilities.append({
-            "type": "error",
-            "url": url,
-            "description": f"扫描过程中发生错误: {str(e)}",
-            "severity": "中"
-        })
+        vulnerabilities.add(Finding("error", url, f"扫描过程中发生错误: {str(e)}", "中"))
+    finally:
+        # 本次扫描的耗时统计，保存在扫描结果的timings中
+        if progress:
+            progress("timings", timings.to_dict())
+            if timings.skipped:
+                progress("partial", {"skipped_requests": timings.skipped})
     
-    return vulnerabilities
-
-async def fetch_url(session: aiohttp.ClientSession, url: str) -> Optional[Dict[str, Any]]:
-    """获取URL的响应"""
-    try:
-        async with session.get(url, timeout=30) as response:
-            status = response.status
-            text = await response.text()
-            headers = dict(response.headers)
-            
-            return {
-                "status": status,
-                "text": text,
-                "headers": headers,
-                "url": str(response.url)
-            }
-    except Exception as e:
-        logger.error(f"获取URL时出错 {url}: {str(e)}")
-        return None
-
-def extract_links(base_url: str, html_content: str) -> List[str]:
-    """从HTML内容中提取链接"""
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        parsed_base = urlparse(base_url)
-        base_domain = parsed_base.netloc
-        
-        links = []
-        
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            
-            # 处理相对URL
-            if href.startswith('/'):
-                link = urlunparse((
-                    parsed_base.scheme,
-                    parsed_base.netloc,
-                    href,
-                    '',
-                    '',
-                    ''
-                ))
-            elif href.startswith('http'):
-                # 只保留同域名链接
-                parsed_href = urlparse(href)
-                if parsed_href.netloc != base_domain:
-                    continue
-                link = href
-            else:
-                # 处理相对路径
-                link = urljoin(base_url, href)
-            
-            if link not in links:
-                links.append(link)
-        
-        return links
-    except Exception as e:
-        logger.error(f"提取链接时出错: {str(e)}")
-        return []
+    return vulnerabilities.to_list()
 
-async def detect_vulnerabilities(
-    session: aiohttp.ClientSession,
-    url: str,
-    response_data: Dict[str, Any],
+async def crawl(
+    session: ScanSession,
+    start_url: str,
+    start_response: Dict[str, Any],
+    depth: int,
+    max_pages: int,
+    workers: int,
     modules: List[str],
-    vulnerability_library: Dict[str, Any],
-    vulnerabilities: List[Dict[str, Any]]
+    rules: RuleSet,
+    vulnerabilities: FindingList,
+    html_parser: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    scope: Optional[CrawlScope] = None,
+    max_query_variants: int = DEFAULT_MAX_QUERY_VARIANTS,
+    previous: Optional[Dict[str, Dict[str, Any]]] = None,
+    shared: Optional[OriginState] = None
 ) -> None:
-    """检测指定URL的漏洞"""
-    html_content = response_data["text"]
-    headers = response_data["headers"]
-    
-    # 根据模块列表执行不同的漏洞检测
-    for module in modules:
-        if module == "sql_injection":
-            await check_sql_injection(session, url, vulnerability_library, vulnerabilities)
-        
-        elif module == "xss":
-            check_xss(url, html_content, vulnerability_library, vulnerabilities)
-        
-        elif module == "csrf":
-            check_csrf(url, html_content, headers, vulnerability_library, vulnerabilities)
-        
-        elif module == "file_upload":
-            check_file_upload(url, html_content, vulnerability_library, vulnerabilities)
-        
-        # 可以根据需要添加更多漏洞检测模块
+    """
+    以工作队列方式爬行并检测页面
 
-async def check_sql_injection(
-    session: aiohttp.ClientSession,
-    url: str, 
-    vulnerability_library: Dict[str, Any],
-    vulnerabilities: List[Dict[str, Any]]
-) -> None:
-    """检测SQL注入漏洞"""
-    if "sql_injection" not in vulnerability_library:
-        return
-    
-    patterns = vulnerability_library["sql_injection"].get("patterns", [])
-    severity = vulnerability_library["sql_injection"].get("severity", "高")
+    队列中的每一项为(URL, 所在层数, 已获取的响应)。workers个协程并发消费队列，
+    层数小于depth的页面会把新发现的链接加入队列，入队页面总数不超过max_pages。
+    链接按scope过滤，已访问索引按规范化后的URL去重，请求时仍使用页面中的原始URL。
+    previous为上次扫描的页面（见baseline_pages），内容哈希相同的页面只提取链接，沿用上次的漏洞。
+    shared为同一批量扫描中同源扫描共享的状态，已由其他扫描爬行的链接不再入队，起始页面总是扫描。
+    """
+    pages_done = 0
+    max_pages = max(1, int(max_pages))
+    workers = max(1, int(workers))
     
-    # 在URL参数中添加SQL注入测试点
-    parsed_url = urlparse(url)
-    path = parsed_url.path
+    scope = scope or CrawlScope(start_url)
+    # 缓存的分析结果只在检测模块、规则版本和爬行范围都相同时复用
+    analysis_key = content_version({
+        "modules": modules,
+        "rules": rules.version,
+        "html_parser": html_parser,
+        "scope": scope.signature()
+    })
+    timings = getattr(session, "timings", None) or ScanTimings()
+    queue: asyncio.Queue = asyncio.Queue()
+    # 基准扫描的页面按规范化后的URL对应
+    if previous:
+        previous = {scope.canonicalize(url) or url: page for url, page in previous.items()}
+    visited = VisitedIndex(max_query_variants)
+    start_key = scope.canonicalize(start_url) or start_url
+    visited.add(start_key)
+    if shared is not None:
+        shared.mark(start_key)
+    queue.put_nowait((start_url, 1, start_response))
+    CRAWL_QUEUE_DEPTH.inc()
     
-    # 如果URL已经有参数，在参数后添加测试点
-    if parsed_url.query:
-        query_parts = parsed_url.query.split('&')
-        for pattern in patterns:
-            test_queries = []
-            for part in query_parts:
-                if '=' in part:
-                    name, value = part.split('=', 1)
-                    test_query = f"{name}={value}{pattern}"
-                    test_queries.append(test_query)
-            
-            if test_queries:
-                test_url = urlunparse((
-                    parsed_url.scheme,
-                    parsed_url.netloc,
-                    path,
-                    '',
-                    '&'.join(test_queries),
-                    parsed_url.fragment
-                ))
+    async def worker() -> None:
+        nonlocal pages_done
+        while True:
+            page_url, level, response_data = await queue.get()
+            CRAWL_QUEUE_DEPTH.dec()
+            try:
+                if response_data is None:
+                    logger.info(f"扫描链接: {page_url}")
+                    response_data = await fetch_page(session, page_url)
+                if not response_data or response_data.get("skipped"):
+                    continue
                 
-                try:
-                    response = await fetch_url(session, test_url)
-                    if response and ('SQL' in response["text"] or 'syntax' in response["text"] 
-                                    or 'mysql' in response["text"].lower() or 'error' in response["text"].lower()):
-                        vulnerabilities.append({
-                            "type": "sql_injection",
-                            "url": url,
-                            "test_url": test_url,
-                            "description": "发现可能的SQL注入漏洞",
-                            "severity": severity,
-                            "details": f"测试参数: {pattern}"
-                        })
-                        break  # 找到一个注入点就停止
-                except Exception as e:
-                    logger.error(f"SQL注入测试时出错: {str(e)}")
-
-def check_xss(
-    url: str, 
-    html_content: str, 
-    vulnerability_library: Dict[str, Any],
-    vulnerabilities: List[Dict[str, Any]]
-) -> None:
-    """检测XSS跨站脚本漏洞"""
-    if "xss" not in vulnerability_library:
-        return
+                content_hash = page_hash(response_data["text"])
+                previous_page = previous.get(scope.canonicalize(page_url) or page_url) if previous else None
+                reused = True
+                
+                # 页面经304验证未变化且分析条件相同时，直接复用上次的分析结果
+                entry = response_data.get("cached_analysis")
+                cached = entry.analysis(analysis_key) if entry else None
+                if cached:
+                    findings, links = cached["findings"], cached["links"]
+                elif previous_page and previous_page["hash"] == content_hash:
+                    # 内容与基准扫描相同，沿用基准扫描的漏洞，只提取链接继续爬行
+                    findings = [dict(finding) for finding in previous_page["findings"]]
+                    links = await run_cpu(parse_links, page_url, response_data["text"], html_parser, scope)
+                else:
+                    reused = False
+                    # 解析页面和静态检测在分析进程池中执行，不占用事件循环
+                    findings, links, analysis_timings = await run_cpu(
+                        analyze_page,
+                        page_url,
+                        response_data["text"],
+                        response_data["headers"],
+                        modules,
+                        rules.library,
+                        html_parser,
+                        rules.version,
+                        scope
+                    )
+                    timings.record_analysis(analysis_timings)
+                    
+                    # 需要发送探测请求的检测模块在事件循环中执行，记录墙钟时间
+                    for detector in probe_detectors(modules):
+                        started = time.perf_counter()
+                        await detector.func(session, page_url, rules, findings)
+                        timings.record_module(detector.name, time.perf_counter() - started)
+                    
+                    key = response_data.get("cache_key")
+                    if key:
+                        await run_blocking(response_cache.put_analysis, key, analysis_key, findings, links)
+                added = vulnerabilities.extend(findings)
+                
+                # 继续向下一层爬行
+                if level < depth:
+                    for link in links:
+                        if len(visited) >= max_pages:
+                            break
+                        key = scope.canonicalize(link) or link
+                        if shared is not None and shared.seen(key):
+                            continue
+                        if not visited.add(key):
+                            continue
+                        if shared is not None:
+                            shared.mark(key)
+                        queue.put_nowait((link, level + 1, None))
+                        CRAWL_QUEUE_DEPTH.inc()
+                    timings.record_queue_depth(queue.qsize())
+                
+                pages_done += 1
+                timings.record_page(reused)
+                if progress:
+                    for finding in added:
+                        progress("finding", finding.to_dict())
+                    progress("page", {
+                        "url": page_url,
+                        "status": response_data["status"],
+                        "level": level,
+                        "findings": len(added),
+                        "hash": content_hash,
+                        "reused": reused,
+                        "pages_done": pages_done,
+                        "pages_queued": len(visited)
+                    })
+            except Exception as e:
+                logger.error(f"扫描页面时出错 {page_url}: {str(e)}")
+            finally:
+                queue.task_done()
+    
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await queue.join()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # 扫描被取消时队列中剩余的页面不再计入
+        CRAWL_QUEUE_DEPTH.dec(queue.qsize())
+
+def page_hash(text: str) -> str:
+    """页面内容哈希，用于判断页面在两次扫描之间是否变化"""
+    return hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()
+
+def baseline_pages(
+    baseline: Optional[Dict[str, Any]],
+    modules: List[str],
+    rules_version: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    从上次扫描结果中取出可沿用的页面，返回{URL: {"hash", "findings"}}
+
+    只沿用已完成（completed）的扫描，部分完成或取消的扫描结果不完整；检测模块或漏洞库版本与本次
+    扫描不同，或旧结果没有记录实际执行的检测模块时也不可沿用。不可沿用时返回空字典
+    """
+    if not baseline:
+        return {}
+    if baseline.get("status") != "completed":
+        logger.info(f"基准扫描 {baseline.get('id')} 未完整完成，执行完整扫描")
+        return {}
+    if baseline.get("library_version") != rules_version or set(baseline.get("modules") or ()) != set(modules):
+        logger.info(f"基准扫描 {baseline.get('id')} 的检测模块或漏洞库版本不同，执行完整扫描")
+        return {}
     
-    patterns = vulnerability_library["xss"].get("patterns", [])
-    severity = vulnerability_library["xss"].get("severity", "高")
+    pages = {
+        page["url"]: {"hash": page.get("hash"), "findings": []}
+        for page in baseline.get("pages", [])
+        if page.get("hash")
+    }
+    for finding in baseline.get("vulnerabilities", []):
+        page = pages.get(finding.get("url"))
+        if page is not None and finding.get("type") != "error":
+            page["findings"].append(finding)
+    return pages
+
+def finding_key(finding: Dict[str, Any]) -> Tuple:
+    """判断两次扫描中是否为同一漏洞的键"""
+    return (finding.get("type"), finding.get("url"), finding.get("test_url"), finding.get("details"))
+
+def diff_findings(
+    previous: List[Dict[str, Any]],
+    current: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """比较两次扫描的漏洞，返回新增（new）、已修复（fixed）的漏洞（字典格式）和未变化的数量（unchanged）"""
+    previous_keys = {finding_key(finding): finding for finding in previous if finding.get("type") != "error"}
+    current_keys = {finding_key(finding): finding for finding in current if finding.get("type") != "error"}
+    return {
+        "new": findings_to_dicts(finding for key, finding in current_keys.items() if key not in previous_keys),
+        "fixed": findings_to_dicts(finding for key, finding in previous_keys.items() if key not in current_keys),
+        "unchanged": sum(1 for key in current_keys if key in previous_keys)
+    }
+
+def is_analyzable_content_type(content_type: str, allowed_types: List[str]) -> bool:
+    """判断响应类型是否需要分析，allowed_types中以/结尾的项按前缀匹配，未声明类型时视为可分析"""
+    mime = content_type.split(";", 1)[0].strip().lower()
+    if not mime:
+        return True
+    return any(
+        mime.startswith(allowed) if allowed.endswith("/") else mime == allowed
+        for allowed in allowed_types
+    )
+
+async def fetch_url(
+    session: ScanSession,
+    url: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    以流式方式获取URL的响应
+
+    只下载需要分析的内容类型（见fetch_content_types配置），响应体超过max_response_bytes时
+    停止读取并截断；非分析类型或Content-Length已超限的响应不下载响应体，结果中skipped为True。
+    连接和读取超时按目标主机的往返时间自适应（见HostHealth），每次重试加倍，最后一次尝试使用
+    scan_timeout；连接错误、超时和502/503/504响应最多重试fetch_retries次，每次之间随机退避。
+    重试用尽仍失败的请求计入主机的熔断计数；主机熔断期间不发送请求，直接返回None并计入
+    timings的skipped_requests
+    """
+    config = getattr(session, "config", {})
+    max_bytes = config.get("max_response_bytes", DEFAULT_MAX_RESPONSE_BYTES)
+    allowed_types = config.get("fetch_content_types", DEFAULT_FETCH_CONTENT_TYPES)
+    max_timeout = config.get("scan_timeout") or DEFAULT_SCAN_TIMEOUT
+    retries = max(0, int(config.get("fetch_retries", DEFAULT_FETCH_RETRIES)))
+    timings = getattr(session, "timings", None) or ScanTimings()
+    health = host_health.get(url)
     
-    # 检查HTML中是否有不安全的输入反射
-    soup = BeautifulSoup(html_content, 'html.parser')
+    for attempt in range(retries + 1):
+        if attempt:
+            timings.record_retry()
+            await asyncio.sleep(backoff_delay(attempt))
+        # 首次尝试需要熔断器放行（冷却结束后作为试探请求），重试只在主机已熔断时放弃
+        blocked = health.tripped if attempt else not health.allow()
+        if blocked:
+            timings.record_skip()
+            return None
+        
+        timeout = max_timeout if attempt == retries else health.timeout(attempt, max_timeout)
+        started = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(
+                total=max_timeout, sock_connect=timeout, sock_read=timeout
+            )) as response:
+                health.record_success(time.perf_counter() - started)
+                if response.status in RETRY_STATUSES and attempt < retries:
+                    timings.record_fetch(time.perf_counter() - started, 0, response.status)
+                    continue
+                
+                result = await _read_response(response, max_bytes, allowed_types)
+                timings.record_fetch(time.perf_counter() - started, result["bytes"], result["status"])
+                return result
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+            timings.record_fetch(time.perf_counter() - started, 0, None)
+            if attempt < retries:
+                logger.info(f"获取URL失败，稍后重试 {url}: {str(e) or type(e).__name__}")
+                continue
+            # 最后一次尝试使用scan_timeout，自适应超时过短导致的失败不会计入熔断
+            health.record_failure()
+            logger.error(f"获取URL时出错 {url}: {str(e) or type(e).__name__}")
+            return None
+        except Exception as e:
+            logger.error(f"获取URL时出错 {url}: {str(e)}")
+            timings.record_fetch(time.perf_counter() - started, 0, None)
+            return None
+    return None
+
+async def _read_response(
+    response: aiohttp.ClientResponse,
+    max_bytes: int,
+    allowed_types: List[str]
+) -> Dict[str, Any]:
+    """读取响应头和需要分析的响应体，边下载边解码，超过max_bytes时截断"""
+    content_type = response.headers.get("Content-Type", "")
+    result = {
+        "status": response.status,
+        "text": "",
+        "headers": dict(response.headers),
+        "url": str(response.url),
+        "content_type": content_type,
+        "bytes": 0,
+        "truncated": False,
+        "skipped": False
+    }
     
-    # 检查表单
-    forms = soup.find_all('form')
-    if forms:
-        for form in forms:
-            inputs = form.find_all('input')
-            if inputs:
-                for input_field in inputs:
-                    # 检查是否对输入进行了适当的过滤
-                    if input_field.get('type') in ['text', 'search', 'url', 'tel', 'email', None]:
-                        vulnerabilities.append({
-                            "type": "xss",
-                            "url": url,
-                            "description": "表单可能存在XSS漏洞",
-                            "severity": severity,
-                            "details": f"表单ID: {form.get('id', '未知')}, 输入字段: {input_field.get('name', '未知')}"
-                        })
-                        break
+    # 非HTML等不需要分析的内容，或声明的长度已超过上限，直接放弃响应体
+    if not is_analyzable_content_type(content_type, allowed_types) or (
+        max_bytes and (response.content_length or 0) > max_bytes
+    ):
+        result["skipped"] = True
+        response.close()
+        return result
     
-    # 检查URL参数是否反射到页面
-    parsed_url = urlparse(url)
-    if parsed_url.query:
-        query_parts = parsed_url.query.split('&')
-        for part in query_parts:
-            if '=' in part:
-                name, value = part.split('=', 1)
-                if value and value in html_content:
-                    for pattern in patterns:
-                        if pattern in value:
-                            vulnerabilities.append({
-                                "type": "xss",
-                                "url": url,
-                                "description": "URL参数被直接反射到页面",
-                                "severity": severity,
-                                "details": f"参数名: {name}, 值: {value}"
-                            })
-                            break
+    # 边下载边解码，超过上限时提前中止
+    decoder = codecs.getincrementaldecoder(_lookup_charset(response.charset))(errors="replace")
+    parts = []
+    async for chunk in response.content.iter_chunked(FETCH_CHUNK_SIZE):
+        if max_bytes and result["bytes"] + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - result["bytes"]]
+            result["truncated"] = True
+        result["bytes"] += len(chunk)
+        parts.append(decoder.decode(chunk))
+        if result["truncated"]:
+            response.close()
+            break
+    parts.append(decoder.decode(b"", final=True))
+    result["text"] = "".join(parts)
+    return result
 
-def check_csrf(
-    url: str, 
-    html_content: str, 
-    headers: Dict[str, str],
-    vulnerability_library: Dict[str, Any],
-    vulnerabilities: List[Dict[str, Any]]
-) -> None:
-    """检测CSRF跨站请求伪造漏洞"""
-    if "csrf" not in vulnerability_library:
-        return
+async def fetch_page(session: ScanSession, url: str) -> Optional[Dict[str, Any]]:
+    """
+    获取爬行的页面，启用response_cache配置时经过跨扫描的响应缓存
+
+    有缓存时发送条件请求，服务器返回304则使用缓存的响应，结果中not_modified为True；
+    可缓存的响应结果中带有cache_key，供保存分析结果
+    """
+    config = getattr(session, "config", {})
+    if not config.get("response_cache"):
+        return await fetch_url(session, url)
     
-    severity = vulnerability_library["csrf"].get("severity", "中")
+    response_cache.configure(
+        config.get("response_cache_ttl", DEFAULT_RESPONSE_CACHE_TTL),
+        config.get("response_cache_max_bytes", DEFAULT_RESPONSE_CACHE_MAX_BYTES)
+    )
+    key = cache_key(url, getattr(session, "headers", None))
+    try:
+        entry = await run_blocking(response_cache.get, key)
+    except Exception as e:
+        logger.error(f"读取响应缓存时出错 {url}: {str(e)}")
+        return await fetch_url(session, url)
     
-    # 检查是否使用了CSRF令牌
-    soup = BeautifulSoup(html_content, 'html.parser')
-    forms = soup.find_all('form', method=re.compile(r'post', re.I))
+    response = await fetch_url(session, url, entry.conditional_headers() if entry else None)
+    if response and response["status"] == 304 and entry:
+        await run_blocking(response_cache.touch, key)
+        cached = entry.to_response()
+        cached["cached_analysis"] = entry
+        return cached
     
-    for form in forms:
-        has_csrf_token = False
+    if response:
+        try:
+            if await run_blocking(response_cache.put, key, response):
+                response["cache_key"] = key
+        except Exception as e:
+            logger.error(f"写入响应缓存时出错 {url}: {str(e)}")
+    return response
+
+def _lookup_charset(charset: Optional[str]) -> str:
+    """返回可用的字符集名称，未声明或无法识别时使用utf-8"""
+    if charset:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+def extract_links(
+    base_url: str,
+    html_content: Union[str, ParsedPage],
+    scope: Optional[CrawlScope] = None
+) -> List[str]:
+    """
+    从HTML内容中提取范围内的链接，返回去掉片段后的绝对URL
+
+    链接保持页面中的原样（包括会话ID等被忽略的参数），请求和探测都使用原始URL；
+    规范化后相同的链接只保留第一个，范围按规范化后的URL判断。
+    可直接传入已解析的页面以避免重复解析；相对链接按<base href>解析，
+    未指定scope时只保留与base_url同一主机的链接
+    """
+    try:
+        page = html_content if isinstance(html_content, ParsedPage) else ParsedPage(base_url, html_content)
+        scope = scope or CrawlScope(base_url)
+        base = urljoin(base_url, page.base_href.strip()) if page.base_href else base_url
         
-        # 查找常见的CSRF令牌字段
-        csrf_fields = form.find_all('input', attrs={
-            'name': re.compile(r'csrf|token|nonce', re.I)
-        })
+        links: Dict[str, str] = {}
         
-        if csrf_fields:
-            has_csrf_token = True
+        for href in page.anchors:
+            link = urldefrag(urljoin(base, href.strip()))[0]
+            key = scope.canonicalize(link)
+            if key and key not in links and scope.in_scope(key):
+                links[key] = link
         
-        if not has_csrf_token:
-            vulnerabilities.append({
-                "type": "csrf",
-                "url": url,
-                "description": "表单没有CSRF保护",
-                "severity": severity,
-                "details": f"表单操作: {form.get('action', '未知')}"
-            })
-    
-    # 检查HTTP安全头
-    has_csrf_headers = False
-    for header in ['X-CSRF-Token', 'X-Frame-Options', 'Content-Security-Policy']:
-        if header.lower() in [h.lower() for h in headers]:
-            has_csrf_headers = True
-            break
-    
-    if not has_csrf_headers and forms:
-        vulnerabilities.append({
-            "type": "csrf",
-            "url": url,
-            "description": "没有使用防CSRF的HTTP安全头",
-            "severity": severity,
-            "details": "缺少X-CSRF-Token、X-Frame-Options或Content-Security-Policy头"
-        })
-
-def check_file_upload(
-    url: str, 
-    html_content: str, 
+        return list(links.values())
+    except Exception as e:
+        logger.error(f"提取链接时出错: {str(e)}")
+        return []
+
+def parse_links(
+    url: str,
+    html_content: str,
+    html_parser: Optional[str] = None,
+    scope: Optional[CrawlScope] = None
+) -> List[str]:
+    """解析页面只提取链接，可以提交到分析进程池执行"""
+    return extract_links(url, ParsedPage(url, html_content, html_parser), scope)
+
+def page_detectors(modules: List[str]) -> List[Detector]:
+    """按modules顺序返回已注册的页面检测模块"""
+    detectors = [get_detector(module) for module in modules]
+    return [detector for detector in detectors if detector and detector.kind == PAGE_DETECTOR]
+
+def probe_detectors(modules: List[str]) -> List[Detector]:
+    """按modules顺序返回已注册的探测检测模块"""
+    detectors = [get_detector(module) for module in modules]
+    return [detector for detector in detectors if detector and detector.kind == PROBE_DETECTOR]
+
+def run_page_detectors(
+    url: str,
+    page: ParsedPage,
+    headers: Dict[str, str],
+    modules: List[str],
+    rules: RuleSet,
+    timings: Optional[Dict[str, float]] = None
+) -> List[Dict[str, Any]]:
+    """对已解析的页面执行不需要发送请求的检测模块，timings不为None时记录各模块的CPU时间"""
+    vulnerabilities: List[Dict[str, Any]] = []
+    for detector in page_detectors(modules):
+        started = time.thread_time()
+        detector.func(url, page, headers, rules, vulnerabilities)
+        if timings is not None:
+            timings[detector.name] = time.thread_time() - started
+    return vulnerabilities
+
+def analyze_page(
+    url: str,
+    html_content: str,
+    headers: Dict[str, str],
+    modules: List[str],
     vulnerability_library: Dict[str, Any],
-    vulnerabilities: List[Dict[str, Any]]
+    html_parser: Optional[str] = None,
+    rules_version: Optional[str] = None,
+    scope: Optional[CrawlScope] = None
+) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, Any]]:
+    """
+    解析页面并执行静态检测，返回(发现的漏洞, 页面中的链接, 耗时)
+
+    耗时为{"parse": 解析的CPU时间, "modules": {模块名: CPU时间}}，在分析进程中测量后随结果返回。
+    只使用可pickle的参数和返回值，可以提交到分析进程池执行；
+    分析进程按rules_version缓存编译后的规则
+    """
+    rules = compile_rules(vulnerability_library, rules_version)
+    started = time.thread_time()
+    page = ParsedPage(url, html_content, html_parser)
+    parse_seconds = time.thread_time() - started
+    module_seconds: Dict[str, float] = {}
+    findings = run_page_detectors(url, page, headers, modules, rules, module_seconds)
+    links = extract_links(url, page, scope)
+    return findings, links, {"parse": parse_seconds, "modules": module_seconds}
+
+async def detect_vulnerabilities(
+    session: ScanSession,
+    url: str,
+    response_data: Dict[str, Any],
+    modules: List[str],
+    rules: RuleSet,
+    vulnerabilities: List[Dict[str, Any]],
+    page: Optional[ParsedPage] = None
 ) -> None:
-    """检测文件上传漏洞"""
-    if "file_upload" not in vulnerability_library:
-        return
+    """检测指定URL的漏洞，页面只解析一次并由各检测模块共用"""
+    for detector in probe_detectors(modules):
+        await detector.func(session, url, rules, vulnerabilities)
     
-    dangerous_extensions = vulnerability_library["file_upload"].get("patterns", [])
-    severity = vulnerability_library["file_upload"].get("severity", "严重")
-    
-    # 检查是否存在文件上传表单
-    soup = BeautifulSoup(html_content, 'html.parser')
-    file_inputs = soup.find_all('input', attrs={'type': 'file'})
-    
-    if file_inputs:
-        for file_input in file_inputs:
-            # 检查是否有扩展名限制
-            accept_attr = file_input.get('accept', '')
-            
-            # 如果没有accept属性或accept属性允许危险文件类型
-            if not accept_attr or any(ext in accept_attr for ext in dangerous_extensions):
-                form = file_input.find_parent('form')
-                form_action = form.get('action', '未知') if form else '未知'
-                
-                vulnerabilities.append({
-                    "type": "file_upload",
-                    "url": url,
-                    "description": "可能的不安全文件上传",
-                    "severity": severity,
-                    "details": f"表单操作: {form_action}, 上传字段: {file_input.get('name', '未知')}"
-                }) 
\ No newline at end of file
+    if page is None:
+        page = ParsedPage(url, response_data["text"])
+    vulnerabilities.extend(
+        run_page_detectors(url, page, response_data["headers"], modules, rules)
+    )
@@ -0,0 +1,106 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def content_version(data: Any) -> str:
+    """根据JSON内容计算版本号，内容相同的文件版本号相同（跨进程、跨重启稳定）"""
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+class JsonFileError(ValueError):
+    """JSON文件存在但为空或无法解析"""
+
+class CachedJsonFile:
+    """
+    带缓存的JSON文件
+
+    读取时只检查文件的修改时间和大小，未变化时直接返回内存中的内容；
+    通过write()写入或调用invalidate()后下次读取会重新加载。
+    get()返回的是共享对象，调用方需要修改时应先copy()。
+    文件为空、不是有效的JSON或顶层不是对象时，读取抛出JsonFileError，不会当作空内容使用。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._version: Optional[str] = None
+        self._error: Optional[str] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature: Tuple[int, int]) -> None:
+        self._signature = signature
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("顶层必须是JSON对象")
+        except ValueError as e:
+            self._data = self._version = None
+            self._error = f"{self.path} 为空或格式无效: {str(e)}"
+            logger.error(self._error)
+            return
+        self._data = data
+        self._version = content_version(data)
+        self._error = None
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """返回文件内容，文件不存在时返回None"""
+        return self.snapshot()[0]
+
+    def snapshot(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """同时返回文件内容和对应的版本号，文件无法解析时抛出JsonFileError"""
+        signature = self._stat()
+        with self._lock:
+            if signature is None:
+                self._data = self._signature = self._version = self._error = None
+            elif signature != self._signature:
+                self._load(signature)
+            if self._error:
+                raise JsonFileError(self._error)
+            return self._data, self._version
+
+    def copy(self) -> Optional[Dict[str, Any]]:
+        """返回文件内容的深拷贝，用于修改后写回"""
+        data = self.get()
+        return copy.deepcopy(data) if data is not None else None
+
+    @property
+    def version(self) -> Optional[str]:
+        """当前内容的版本号，文件不存在时为None"""
+        return self.snapshot()[1]
+
+    def write(self, data: Dict[str, Any]) -> None:
+        """写入文件并更新缓存"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(data, f, indent=2)
+            self._data = None
+            self._signature = None
+            self._load(self._stat())
+            if self._error:
+                raise JsonFileError(self._error)
+
+    def invalidate(self) -> None:
+        """丢弃缓存，下次读取时重新加载"""
+        with self._lock:
+            self._data = self._signature = self._version = self._error = None
+
+# 应用配置和漏洞库缓存
+config_cache = CachedJsonFile(Path("data/config.json"))
+library_cache = CachedJsonFile(Path("data/vulnerabilities.json"))
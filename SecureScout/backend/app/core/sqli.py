@@ -0,0 +1,165 @@
+import asyncio
+import re
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+# 各数据库的错误信息特征，出现在探测响应中而不出现在基准响应中时判定为注入点
+DBMS_ERROR_SIGNATURES = {
+    "MySQL": [
+        r"SQL syntax.*?MySQL",
+        r"You have an error in your SQL syntax",
+        r"Warning.*?\Wmysqli?_",
+        r"MySQLSyntaxErrorException",
+        r"valid MySQL result",
+        r"check the manual that (?:corresponds to|fits) your (?:MySQL|MariaDB) server version",
+    ],
+    "PostgreSQL": [
+        r"PostgreSQL.*?ERROR",
+        r"Warning.*?\Wpg_",
+        r"valid PostgreSQL result",
+        r"Npgsql\.",
+        r"PG::SyntaxError:",
+        r"org\.postgresql\.util\.PSQLException",
+        r"ERROR:\s\ssyntax error at or near",
+        r"unterminated quoted string at or near",
+    ],
+    "Microsoft SQL Server": [
+        r"Driver.*? SQL[\-_ ]*Server",
+        r"OLE DB.*? SQL Server",
+        r"\bSQL Server[^<\"]+Driver",
+        r"Warning.*?\W(?:mssql|sqlsrv)_",
+        r"System\.Data\.SqlClient\.SqlException",
+        r"Unclosed quotation mark after the character string",
+        r"Microsoft SQL Native Client error",
+    ],
+    "Oracle": [
+        r"\bORA-\d{5}",
+        r"Oracle error",
+        r"Oracle.*?Driver",
+        r"Warning.*?\W(?:oci|ora)_",
+        r"quoted string not properly terminated",
+    ],
+    "SQLite": [
+        r"SQLite/JDBCDriver",
+        r"SQLite\.Exception",
+        r"System\.Data\.SQLite\.SQLiteException",
+        r"Warning.*?\W(?:sqlite_|SQLite3::)",
+        r"\[SQLITE_ERROR\]",
+        r"SQLite error \d+:",
+        r"sqlite3\.OperationalError:",
+        r"unrecognized token:",
+    ],
+    "IBM DB2": [
+        r"CLI Driver.*?DB2",
+        r"DB2 SQL error",
+        r"\bdb2_\w+\(",
+        r"SQLSTATE.+SQLCODE",
+    ],
+    "Microsoft Access": [
+        r"Microsoft Access (?:\d+ )?Driver",
+        r"JET Database Engine",
+        r"Access Database Engine",
+    ],
+}
+
+# 所有特征合并为一个正则，每个数据库一个命名分组，一次扫描即可得到匹配的数据库
+_DBMS_GROUPS = {f"dbms{index}": name for index, name in enumerate(DBMS_ERROR_SIGNATURES)}
+DBMS_ERROR_RE = re.compile(
+    "|".join(
+        f"(?P<{group}>{'|'.join(DBMS_ERROR_SIGNATURES[name])})"
+        for group, name in _DBMS_GROUPS.items()
+    ),
+    re.I
+)
+
+# 计算相似度时最多使用的词数，避免超大页面拖慢比较
+MAX_FINGERPRINT_TOKENS = 20000
+
+# 低于该相似度时认为探测响应与基准响应明显不同
+DEFAULT_SIMILARITY_THRESHOLD = 0.6
+
+TOKEN_RE = re.compile(r"\w+")
+
+def find_dbms_error(text: str) -> Optional[str]:
+    """返回文本中出现的数据库错误信息对应的数据库名，没有时返回None"""
+    if not text:
+        return None
+    match = DBMS_ERROR_RE.search(text)
+    return _DBMS_GROUPS[match.lastgroup] if match else None
+
+class PageFingerprint:
+    """
+    响应指纹
+
+    由状态码、长度和词三元组（shingle）哈希集合组成，比较两次响应时不需要保留原文
+    """
+
+    __slots__ = ("status", "length", "shingles", "dbms_error")
+
+    def __init__(self, status: int, length: int, shingles: frozenset, dbms_error: Optional[str]):
+        self.status = status
+        self.length = length
+        self.shingles = shingles
+        self.dbms_error = dbms_error
+
+def fingerprint(response: Dict[str, Any]) -> PageFingerprint:
+    """计算fetch_url返回结果的指纹"""
+    text = response.get("text") or ""
+    tokens = TOKEN_RE.findall(text)[:MAX_FINGERPRINT_TOKENS]
+    shingles = frozenset(map(hash, zip(tokens, tokens[1:], tokens[2:])))
+    return PageFingerprint(response.get("status", 0), len(text), shingles, find_dbms_error(text))
+
+def similarity(a: PageFingerprint, b: PageFingerprint) -> float:
+    """两个指纹内容的相似度（shingle集合的Jaccard系数），0为完全不同，1为相同"""
+    if not a.shingles and not b.shingles:
+        longer = max(a.length, b.length)
+        return min(a.length, b.length) / longer if longer else 1.0
+    union = len(a.shingles | b.shingles)
+    return len(a.shingles & b.shingles) / union
+
+class BaselineCache:
+    """
+    单次扫描内的基准响应缓存
+
+    每个URL最多请求一次基准响应，同时发起的多个请求共用同一个结果
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, asyncio.Future] = {}
+
+    async def get(
+        self,
+        url: str,
+        fetch: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[PageFingerprint]:
+        """返回URL的基准指纹，未缓存时调用fetch(url)获取，获取失败时返回None"""
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = self._entries[url] = asyncio.ensure_future(self._fetch(url, fetch))
+        return await asyncio.shield(entry)
+
+    @staticmethod
+    async def _fetch(url: str, fetch: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[PageFingerprint]:
+        response = await fetch(url)
+        return fingerprint(response) if response else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def classify_probe(
+    baseline: PageFingerprint,
+    probe: PageFingerprint,
+    threshold: float = DEFAULT_SIMILARITY_THRESHOLD
+) -> Optional[Dict[str, Any]]:
+    """
+    与基准响应比较判断探测是否命中
+
+    探测响应出现基准中没有的数据库错误时判定为命中；没有错误信息但正常页面变为
+    内容明显不同的5xx错误页时作为可能的注入点。返回包含判定依据的字典，未命中时返回None
+    """
+    if probe.dbms_error and probe.dbms_error != baseline.dbms_error:
+        return {"dbms": probe.dbms_error, "confidence": "高", "similarity": round(similarity(baseline, probe), 3)}
+    if probe.status >= 500 > baseline.status:
+        score = similarity(baseline, probe)
+        if score < threshold:
+            return {"dbms": None, "confidence": "中", "similarity": round(score, 3)}
+    return None
@@ -0,0 +1,475 @@
+import json
+import base64
+import sqlite3
+import logging
+import argparse
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+from app.core.findings import encode_findings, decode_findings
+from app.core.batches import origin_of
+
+logger = logging.getLogger(__name__)
+
+# 扫描结果数据库
+RESULTS_DB_FILE = Path("data/scan_results.db")
+
+# 旧版本使用的JSON结果文件，首次启动时导入数据库
+LEGACY_RESULTS_FILE = Path("data/scan_results.json")
+
+def encode_result(scan_result: Dict[str, Any]) -> str:
+    """
+    把扫描结果序列化为保存在数据库中的紧凑JSON
+
+    vulnerabilities和diff中的漏洞列表使用encode_findings的字符串表格式，
+    重复的类型、描述、严重程度和URL只保存一次
+    """
+    data = dict(scan_result)
+    if isinstance(data.get("vulnerabilities"), list):
+        data["vulnerabilities"] = encode_findings(data["vulnerabilities"])
+    if isinstance(data.get("diff"), dict):
+        data["diff"] = {
+            key: encode_findings(value) if key in ("new", "fixed") and isinstance(value, list) else value
+            for key, value in data["diff"].items()
+        }
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def decode_result(raw: str) -> Dict[str, Any]:
+    """还原encode_result保存的扫描结果，也兼容直接保存漏洞列表的旧记录"""
+    data = json.loads(raw)
+    if isinstance(data.get("vulnerabilities"), dict):
+        data["vulnerabilities"] = decode_findings(data["vulnerabilities"])
+    diff = data.get("diff")
+    if isinstance(diff, dict):
+        for key in ("new", "fixed"):
+            if isinstance(diff.get(key), dict):
+                diff[key] = decode_findings(diff[key])
+    return data
+
+def _migration_v1(conn: sqlite3.Connection) -> None:
+    """初始表结构"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scan_results (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            data TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+def _migration_v2(conn: sqlite3.Connection) -> None:
+    """增加开始时间和状态列及其索引，并回填已有记录"""
+    conn.execute("ALTER TABLE scan_results ADD COLUMN start_time TEXT")
+    conn.execute("ALTER TABLE scan_results ADD COLUMN status TEXT")
+    for seq, data in conn.execute("SELECT seq, data FROM scan_results").fetchall():
+        result = decode_result(data)
+        conn.execute(
+            "UPDATE scan_results SET start_time = ?, status = ? WHERE seq = ?",
+            (result.get("start_time") or "", result.get("status"), seq)
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_results_start_time ON scan_results (start_time, seq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_results_status ON scan_results (status, start_time)")
+
+def _migration_v3(conn: sqlite3.Connection) -> None:
+    """增加按天汇总的统计表，并根据已有记录生成统计"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_scans (
+            day TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, status)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_vulnerabilities (
+            day TEXT NOT NULL,
+            vuln_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, vuln_type, severity)
+        )
+    """)
+    _rebuild_stats(conn)
+
+def _migration_v4(conn: sqlite3.Connection) -> None:
+    """增加持久化的扫描任务队列"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            record TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_jobs_queue ON scan_jobs (status, priority DESC, seq)")
+
+def _migration_v5(conn: sqlite3.Connection) -> None:
+    """把已有扫描结果重新保存为紧凑格式"""
+    for seq, data in conn.execute("SELECT seq, data FROM scan_results").fetchall():
+        conn.execute("UPDATE scan_results SET data = ? WHERE seq = ?", (encode_result(decode_result(data)), seq))
+
+def _migration_v6(conn: sqlite3.Connection) -> None:
+    """扫描任务增加租约字段，并增加工作进程表，支持多个进程共同消费任务队列"""
+    conn.execute("ALTER TABLE scan_jobs ADD COLUMN worker_id TEXT")
+    conn.execute("ALTER TABLE scan_jobs ADD COLUMN lease_expires REAL")
+    conn.execute("ALTER TABLE scan_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE scan_jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scan_workers (
+            id TEXT PRIMARY KEY,
+            host TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            slots INTEGER NOT NULL,
+            running INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            heartbeat_at REAL NOT NULL
+        )
+    """)
+
+def _migration_v7(conn: sqlite3.Connection) -> None:
+    """扫描任务增加源站字段，取任务时限制同一源站同时运行的扫描数"""
+    conn.execute("ALTER TABLE scan_jobs ADD COLUMN origin TEXT")
+    for job_id, params in conn.execute("SELECT id, params FROM scan_jobs").fetchall():
+        url = json.loads(params).get("url")
+        if url:
+            conn.execute("UPDATE scan_jobs SET origin = ? WHERE id = ?", (origin_of(url), job_id))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_jobs_origin ON scan_jobs (origin, status)")
+
+# 按顺序执行的表结构迁移，下标+1即迁移后的版本号(PRAGMA user_version)
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migration_v1,
+    _migration_v2,
+    _migration_v3,
+    _migration_v4,
+    _migration_v5,
+    _migration_v6,
+    _migration_v7,
+]
+
+def _result_day(scan_result: Dict[str, Any]) -> str:
+    return (scan_result.get("start_time") or "")[:10]
+
+def _vulnerability_counts(scan_result: Dict[str, Any]) -> Counter:
+    """统计一次扫描中各(漏洞类型, 严重程度)的数量，只有已完成（含部分完成）的扫描计入"""
+    if scan_result.get("status") not in ("completed", "partial"):
+        return Counter()
+    return Counter(
+        (vuln.get("type", "其他"), vuln.get("severity", "中"))
+        for vuln in scan_result.get("vulnerabilities", [])
+    )
+
+def _apply_stats(conn: sqlite3.Connection, scan_result: Dict[str, Any], sign: int) -> None:
+    """把一条扫描结果计入（sign=1）或移出（sign=-1）汇总统计"""
+    day = _result_day(scan_result)
+    conn.execute(
+        "INSERT INTO stats_scans (day, status, count) VALUES (?, ?, ?) "
+        "ON CONFLICT (day, status) DO UPDATE SET count = count + excluded.count",
+        (day, scan_result.get("status") or "", sign)
+    )
+    for (vuln_type, severity), count in _vulnerability_counts(scan_result).items():
+        conn.execute(
+            "INSERT INTO stats_vulnerabilities (day, vuln_type, severity, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (day, vuln_type, severity) DO UPDATE SET count = count + excluded.count",
+            (day, vuln_type, severity, sign * count)
+        )
+
+def _rebuild_stats(conn: sqlite3.Connection) -> None:
+    """清空并根据全部扫描结果重新生成汇总统计"""
+    conn.execute("DELETE FROM stats_scans")
+    conn.execute("DELETE FROM stats_vulnerabilities")
+    for (data,) in conn.execute("SELECT data FROM scan_results").fetchall():
+        _apply_stats(conn, decode_result(data), 1)
+
+def encode_cursor(start_time: str, seq: int) -> str:
+    """把分页位置编码为不透明的游标字符串"""
+    raw = json.dumps([start_time, seq]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析游标，格式错误时抛出ValueError"""
+    try:
+        start_time, seq = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(start_time), int(seq)
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+class ScanResultStore:
+    """
+    基于SQLite的扫描结果存储
+
+    使用WAL模式，每次保存只追加一行，不再重写全部历史；多个后台扫描同时完成时
+    由SQLite的锁保证写入安全。每个线程使用独立的连接。
+    """
+
+    def __init__(self, db_path: Path = RESULTS_DB_FILE, legacy_file: Optional[Path] = LEGACY_RESULTS_FILE):
+        self.db_path = Path(db_path)
+        self.legacy_file = legacy_file
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.init()
+        return self._connect()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """在写事务中执行，异常时回滚"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def init(self) -> None:
+        """
+        执行表结构迁移，并导入旧版本的JSON结果文件
+
+        API进程和工作进程可能同时启动，每个迁移在取得写锁后重新读取版本号，
+        已由其他进程执行的迁移直接跳过
+        """
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = self._connect()
+            while conn.execute("PRAGMA user_version").fetchone()[0] < len(MIGRATIONS):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                    if version < len(MIGRATIONS):
+                        MIGRATIONS[version](conn)
+                        conn.execute(f"PRAGMA user_version = {version + 1}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            self._initialized = True
+            self._import_legacy_file()
+
+    def _import_legacy_file(self) -> None:
+        if not self.legacy_file or not self.legacy_file.exists():
+            return
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+
+        try:
+            with open(self.legacy_file, "r") as f:
+                scan_results = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"读取旧版扫描结果文件时出错: {str(e)}")
+            scan_results = []
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 取得写锁后重新检查，避免多个进程同时启动时重复导入
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                conn.execute("COMMIT")
+                return
+            for result in scan_results:
+                if result.get("id"):
+                    self._insert(conn, result)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"已从 {self.legacy_file} 导入 {len(scan_results)} 条扫描记录")
+
+    def _insert(self, conn: sqlite3.Connection, scan_result: Dict[str, Any]) -> None:
+        # 覆盖已有记录时先把旧记录移出统计
+        row = conn.execute("SELECT data FROM scan_results WHERE id = ?", (scan_result["id"],)).fetchone()
+        if row:
+            _apply_stats(conn, decode_result(row[0]), -1)
+        _apply_stats(conn, scan_result, 1)
+        conn.execute(
+            "INSERT OR REPLACE INTO scan_results (id, start_time, status, data) VALUES (?, ?, ?, ?)",
+            (
+                scan_result["id"],
+                scan_result.get("start_time") or "",
+                scan_result.get("status"),
+                encode_result(scan_result)
+            )
+        )
+
+    def save(self, scan_result: Dict[str, Any]) -> None:
+        """保存一条扫描结果，相同ID的记录会被覆盖"""
+        with self.transaction() as conn:
+            self._insert(conn, scan_result)
+
+    def get(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        """按ID获取扫描结果"""
+        row = self.conn.execute("SELECT data FROM scan_results WHERE id = ?", (scan_id,)).fetchone()
+        return decode_result(row[0]) if row else None
+
+    def _filters(
+        self,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[str], List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if since:
+            clauses.append("start_time > ?")
+            params.append(since)
+        if until:
+            clauses.append("start_time <= ?")
+            params.append(until)
+        return clauses, params
+
+    def count(
+        self,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> int:
+        """统计符合条件的扫描结果数量"""
+        clauses, params = self._filters(status, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.conn.execute(f"SELECT COUNT(*) FROM scan_results {where}", params).fetchone()[0]
+
+    def query(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按开始时间从新到旧分页查询扫描结果
+
+        传入cursor时从游标位置继续（忽略offset），返回(本页结果, 下一页游标)，
+        没有更多结果时下一页游标为None。
+        """
+        clauses, params = self._filters(status, since, until)
+        if cursor:
+            cursor_time, cursor_seq = decode_cursor(cursor)
+            clauses.append("(start_time < ? OR (start_time = ? AND seq < ?))")
+            params.extend([cursor_time, cursor_time, cursor_seq])
+            offset = 0
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        rows = self.conn.execute(
+            f"SELECT seq, start_time, data FROM scan_results {where} "
+            "ORDER BY start_time DESC, seq DESC LIMIT ? OFFSET ?",
+            params + [limit + 1, offset]
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return [decode_result(row[2]) for row in rows], next_cursor
+
+    def fetch_batch(
+        self,
+        after_seq: int = 0,
+        limit: int = 100,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        按保存顺序读取seq大于after_seq的一批扫描结果，返回[(seq, 扫描结果)]
+
+        用于分批导出：每批在线程池中独立查询，下一批从上一批最后的seq继续
+        """
+        clauses, params = self._filters(status, since, until)
+        clauses.append("seq > ?")
+        params.append(after_seq)
+        rows = self.conn.execute(
+            f"SELECT seq, data FROM scan_results WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [(seq, decode_result(data)) for seq, data in rows]
+
+    def delete(self, scan_id: str) -> bool:
+        """删除扫描结果，记录不存在时返回False"""
+        with self.transaction() as conn:
+            row = conn.execute("SELECT data FROM scan_results WHERE id = ?", (scan_id,)).fetchone()
+            if row:
+                _apply_stats(conn, decode_result(row[0]), -1)
+                conn.execute("DELETE FROM scan_results WHERE id = ?", (scan_id,))
+        return row is not None
+
+    def rebuild_stats(self) -> None:
+        """根据全部扫描结果重新生成汇总统计"""
+        with self.transaction() as conn:
+            _rebuild_stats(conn)
+
+    def stats(self, since: Optional[str] = None) -> Tuple[Dict[str, int], Dict[Tuple[str, str], int]]:
+        """
+        从汇总表读取统计，返回({状态: 扫描数}, {(漏洞类型, 严重程度): 数量})
+
+        since为ISO时间时只统计开始时间晚于since的扫描：since之后的整天直接读汇总表，
+        since所在的当天通过start_time索引读取原始记录，结果与逐条统计一致。
+        """
+        conn = self.conn
+        scan_counts: Counter = Counter()
+        vuln_counts: Counter = Counter()
+
+        if since:
+            since_day = since[:10]
+            day_filter, params = "WHERE day > ?", [since_day]
+        else:
+            day_filter, params = "", []
+
+        for status, count in conn.execute(f"SELECT status, SUM(count) FROM stats_scans {day_filter} GROUP BY status", params):
+            scan_counts[status] += count
+        for vuln_type, severity, count in conn.execute(
+            f"SELECT vuln_type, severity, SUM(count) FROM stats_vulnerabilities {day_filter} GROUP BY vuln_type, severity",
+            params
+        ):
+            vuln_counts[(vuln_type, severity)] += count
+
+        if since:
+            for (data,) in conn.execute(
+                "SELECT data FROM scan_results WHERE start_time > ? AND start_time < ?",
+                (since, f"{since_day}\uffff")
+            ):
+                scan_result = decode_result(data)
+                scan_counts[scan_result.get("status") or ""] += 1
+                vuln_counts.update(_vulnerability_counts(scan_result))
+
+        return (
+            {status: count for status, count in scan_counts.items() if count},
+            {key: count for key, count in vuln_counts.items() if count}
+        )
+
+# 应用共用的扫描结果存储
+result_store = ScanResultStore()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SecureScout扫描结果存储维护工具")
+    parser.add_argument("command", choices=["rebuild-stats"], help="rebuild-stats: 重新生成汇总统计")
+    args = parser.parse_args()
+
+    if args.command == "rebuild-stats":
+        result_store.rebuild_stats()
+        print("汇总统计已重新生成")
@@ -0,0 +1,159 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+# 默认忽略的查询参数（跟踪参数和会话ID），以*结尾的项按前缀匹配，不区分大小写
+DEFAULT_IGNORED_QUERY_PARAMS = [
+    "utm_*", "gclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga",
+    "jsessionid", "phpsessid", "aspsessionid*", "sid", "sessionid"
+]
+
+# 同一路径默认最多访问的不同查询参数组合数，避免日历、筛选类页面耗尽页面预算
+DEFAULT_MAX_QUERY_VARIANTS = 10
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# 路径中的会话ID参数，如/index.jsp;jsessionid=...
+SESSION_PATH_PARAM_RE = re.compile(r';(?:jsessionid|phpsessid|sid)=[^/]*', re.I)
+
+PERCENT_ESCAPE_RE = re.compile(r'%[0-9a-fA-F]{2}')
+
+def _remove_dot_segments(path: str) -> str:
+    segments: List[str] = []
+    parts = path.split("/")
+    for segment in parts:
+        if segment == "..":
+            if len(segments) > 1:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    if parts[-1] in (".", ".."):
+        segments.append("")
+    return "/".join(segments) or "/"
+
+def _param_matcher(ignored_params: List[str]) -> Tuple[Set[str], Tuple[str, ...]]:
+    names = [name.lower() for name in ignored_params if name]
+    return (
+        {name for name in names if not name.endswith("*")},
+        tuple(name[:-1] for name in names if name.endswith("*"))
+    )
+
+_DEFAULT_IGNORED_NAMES, _DEFAULT_IGNORED_PREFIXES = _param_matcher(DEFAULT_IGNORED_QUERY_PARAMS)
+
+def _default_ignored(name: str) -> bool:
+    name = name.lower()
+    return name in _DEFAULT_IGNORED_NAMES or name.startswith(_DEFAULT_IGNORED_PREFIXES)
+
+def canonicalize_url(url: str, ignored: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+    """
+    返回URL的规范形式，不是http(s)链接或无法解析时返回None
+
+    ignored(参数名)返回True的查询参数会被去掉，未指定时使用DEFAULT_IGNORED_QUERY_PARAMS
+    """
+    if ignored is None:
+        ignored = _default_ignored
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = parts.hostname
+    if scheme not in DEFAULT_PORTS or not host:
+        return None
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host if port is None or port == DEFAULT_PORTS[scheme] else f"{host}:{port}"
+
+    path = _remove_dot_segments(SESSION_PATH_PARAM_RE.sub("", parts.path) or "/")
+    params = [
+        param for param in parts.query.split("&")
+        if param and not ignored(param.split("=", 1)[0])
+    ]
+    query = "&".join(sorted(params))
+    canonical = urlunsplit((scheme, netloc, path, query, ""))
+    return PERCENT_ESCAPE_RE.sub(lambda match: match.group(0).upper(), canonical)
+
+class CrawlScope:
+    """
+    爬行范围和URL规范化规则
+
+    canonicalize()把URL规范为唯一形式：协议和主机名小写、去掉默认端口、片段和忽略的查询参数，
+    查询参数排序；in_scope()判断规范化后的URL是否在扫描范围内。默认只爬行起始URL所在主机，
+    指定include时URL需匹配其中一个正则，匹配exclude中任一正则的URL被排除。
+    只包含字符串和编译后的正则，可以传给分析进程。
+    """
+
+    def __init__(
+        self,
+        start_url: str,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        ignored_params: Optional[List[str]] = None
+    ):
+        if ignored_params is None:
+            ignored_params = DEFAULT_IGNORED_QUERY_PARAMS
+        self.ignored_params = list(ignored_params)
+        self.ignored_names, self.ignored_prefixes = _param_matcher(self.ignored_params)
+        self.include = [re.compile(pattern) for pattern in include or []]
+        self.exclude = [re.compile(pattern) for pattern in exclude or []]
+
+        start = self.canonicalize(start_url)
+        self.origin = urlsplit(start).netloc if start else None
+
+    def _ignored(self, name: str) -> bool:
+        name = name.lower()
+        return name in self.ignored_names or (bool(self.ignored_prefixes) and name.startswith(self.ignored_prefixes))
+
+    def canonicalize(self, url: str) -> Optional[str]:
+        """返回URL的规范形式，不是http(s)链接或无法解析时返回None"""
+        return canonicalize_url(url, self._ignored)
+
+    def signature(self) -> Dict[str, Any]:
+        """范围规则的可序列化描述，用于判断缓存的分析结果是否仍然适用"""
+        return {
+            "origin": self.origin,
+            "include": [pattern.pattern for pattern in self.include],
+            "exclude": [pattern.pattern for pattern in self.exclude],
+            "ignored_params": self.ignored_params
+        }
+
+    def in_scope(self, url: str) -> bool:
+        """判断规范化后的URL是否在扫描范围内"""
+        if self.include:
+            if not any(pattern.search(url) for pattern in self.include):
+                return False
+        elif urlsplit(url).netloc != self.origin:
+            return False
+        return not any(pattern.search(url) for pattern in self.exclude)
+
+class VisitedIndex:
+    """
+    扫描内共享的已访问URL索引
+
+    保存规范化后的URL，同一路径的不同查询参数组合超过max_query_variants后不再接受（0为不限制）
+    """
+
+    def __init__(self, max_query_variants: int = DEFAULT_MAX_QUERY_VARIANTS):
+        self.max_query_variants = max_query_variants
+        self.urls: Set[str] = set()
+        self.variants: Dict[str, int] = {}
+
+    def add(self, url: str) -> bool:
+        """记录URL，已访问过或超过同路径参数组合上限时返回False"""
+        if url in self.urls:
+            return False
+        base, _, query = url.partition("?")
+        if query and self.max_query_variants:
+            count = self.variants.get(base, 0)
+            if count >= self.max_query_variants:
+                return False
+            self.variants[base] = count + 1
+        self.urls.add(url)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.urls
+
+    def __len__(self) -> int:
+        return len(self.urls)
@@ -0,0 +1,58 @@
+import re
+from typing import List, Dict, Any
+from app.core.document import ParsedPage
+from app.core.rules import RuleSet
+from app.core.registry import register_detector
+
+# CSRF检测使用的预编译正则
+POST_METHOD_RE = re.compile(r'post', re.I)
+CSRF_FIELD_RE = re.compile(r'csrf|token|nonce', re.I)
+
+# 可以防御CSRF的HTTP安全头（小写）
+CSRF_HEADERS = ('x-csrf-token', 'x-frame-options', 'content-security-policy')
+
+@register_detector("csrf")
+def check_csrf(
+    url: str, 
+    page: ParsedPage, 
+    headers: Dict[str, str],
+    rules: RuleSet,
+    vulnerabilities: List[Dict[str, Any]]
+) -> None:
+    """检测CSRF跨站请求伪造漏洞"""
+    if "csrf" not in rules:
+        return
+    
+    severity = rules["csrf"].get("severity", "中")
+    
+    # 检查是否使用了CSRF令牌
+    forms = [form for form in page.forms if form["method"] and POST_METHOD_RE.search(form["method"])]
+    
+    for form in forms:
+        # 查找常见的CSRF令牌字段
+        has_csrf_token = any(
+            input_field["name"] and CSRF_FIELD_RE.search(input_field["name"])
+            for input_field in form["inputs"]
+        )
+        
+        if not has_csrf_token:
+            vulnerabilities.append({
+                "type": "csrf",
+                "url": url,
+                "description": "表单没有CSRF保护",
+                "severity": severity,
+                "details": f"表单操作: {form['action'] or '未知'}"
+            })
+    
+    # 检查HTTP安全头
+    header_names = {h.lower() for h in headers}
+    has_csrf_headers = any(header in header_names for header in CSRF_HEADERS)
+    
+    if not has_csrf_headers and forms:
+        vulnerabilities.append({
+            "type": "csrf",
+            "url": url,
+            "description": "没有使用防CSRF的HTTP安全头",
+            "severity": severity,
+            "details": "缺少X-CSRF-Token、X-Frame-Options或Content-Security-Policy头"
+        })
@@ -0,0 +1,37 @@
+from typing import List, Dict, Any
+from app.core.document import ParsedPage
+from app.core.rules import RuleSet
+from app.core.registry import register_detector
+
+@register_detector("file_upload")
+def check_file_upload(
+    url: str, 
+    page: ParsedPage, 
+    headers: Dict[str, str],
+    rules: RuleSet,
+    vulnerabilities: List[Dict[str, Any]]
+) -> None:
+    """检测文件上传漏洞"""
+    if "file_upload" not in rules:
+        return
+    
+    dangerous_extensions = rules["file_upload"].matcher
+    severity = rules["file_upload"].get("severity", "严重")
+    
+    # 检查是否存在文件上传表单
+    for file_input in page.file_inputs:
+        # 检查是否有扩展名限制
+        accept_attr = file_input["accept"] or ''
+        
+        # 如果没有accept属性或accept属性允许危险文件类型
+        if not accept_attr or dangerous_extensions.search(accept_attr):
+            form = page.forms[file_input["form"]] if file_input["form"] is not None else None
+            form_action = (form["action"] or '未知') if form else '未知'
+            
+            vulnerabilities.append({
+                "type": "file_upload",
+                "url": url,
+                "description": "可能的不安全文件上传",
+                "severity": severity,
+                "details": f"表单操作: {form_action}, 上传字段: {file_input['name'] or '未知'}"
+            })
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse, urlunparse
+from app.core.http import ScanSession
+from app.core.rules import RuleSet
+from app.core.sqli import BaselineCache, fingerprint, classify_probe
+from app.core.ratelimit import HostRateLimiter, host_limiter
+from app.core.registry import register_detector, PROBE_DETECTOR
+from app.core.scanner import fetch_url
+
+logger = logging.getLogger(__name__)
+
+@register_detector("sql_injection", PROBE_DETECTOR)
+async def check_sql_injection(
+    session: ScanSession,
+    url: str, 
+    rules: RuleSet,
+    vulnerabilities: List[Dict[str, Any]],
+    limiter: Optional[HostRateLimiter] = None
+) -> None:
+    """
+    检测SQL注入漏洞，各测试点经主机限速器并发探测
+
+    先获取一次基准响应，探测响应出现基准中没有的数据库错误信息，或由正常页面变为
+    内容明显不同的5xx错误页时才判定为注入点
+    """
+    if "sql_injection" not in rules:
+        return
+    
+    patterns = rules["sql_injection"].patterns
+    severity = rules["sql_injection"].get("severity", "高")
+    limiter = limiter or host_limiter
+    
+    # 在URL参数中添加SQL注入测试点
+    parsed_url = urlparse(url)
+    path = parsed_url.path
+    
+    # 如果URL已经有参数，在参数后添加测试点
+    if not parsed_url.query:
+        return
+    
+    query_parts = parsed_url.query.split('&')
+    probes = []
+    for pattern in patterns:
+        test_queries = []
+        for part in query_parts:
+            if '=' in part:
+                name, value = part.split('=', 1)
+                test_query = f"{name}={value}{pattern}"
+                test_queries.append(test_query)
+        
+        if test_queries:
+            test_url = urlunparse((
+                parsed_url.scheme,
+                parsed_url.netloc,
+                path,
+                '',
+                '&'.join(test_queries),
+                parsed_url.fragment
+            ))
+            probes.append((pattern, test_url))
+    
+    if not probes:
+        return
+    
+    # 批量扫描中同一源站的探测请求共用一个预算，用完后不再探测
+    shared = getattr(session, "origin_state", None)
+    
+    async def fetch_limited(target_url: str) -> Optional[Dict[str, Any]]:
+        if shared is not None and not shared.take_probe():
+            return None
+        async with limiter.acquire(target_url):
+            return await fetch_url(session, target_url)
+    
+    # 基准响应在本次扫描内按URL缓存，每个URL最多额外请求一次
+    cache = getattr(session, "cache", None)
+    baselines = cache.setdefault("sqli_baselines", BaselineCache()) if cache is not None else BaselineCache()
+    try:
+        baseline = await baselines.get(url, fetch_limited)
+    except Exception as e:
+        logger.error(f"获取SQL注入基准响应时出错: {str(e)}")
+        return
+    if baseline is None:
+        return
+    
+    async def probe(pattern: str, test_url: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = await fetch_limited(test_url)
+            if not response:
+                return None
+            verdict = classify_probe(baseline, fingerprint(response))
+            if verdict:
+                details = f"测试参数: {pattern}"
+                if verdict["dbms"]:
+                    details += f", 数据库错误: {verdict['dbms']}"
+                else:
+                    details += f", 响应状态: {response['status']}"
+                return {
+                    "type": "sql_injection",
+                    "url": url,
+                    "test_url": test_url,
+                    "description": "发现可能的SQL注入漏洞",
+                    "severity": severity,
+                    "details": details,
+                    "confidence": verdict["confidence"]
+                }
+        except Exception as e:
+            logger.error(f"SQL注入测试时出错: {str(e)}")
+        return None
+    
+    # 所有测试点并发探测，找到一个注入点就取消其余探测
+    pending = {asyncio.create_task(probe(pattern, test_url)) for pattern, test_url in probes}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            hits = [task.result() for task in done if task.result()]
+            if hits:
+                vulnerabilities.append(hits[0])
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
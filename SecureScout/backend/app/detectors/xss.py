@@ -0,0 +1,50 @@
+from typing import List, Dict, Any
+from urllib.parse import urlparse
+from app.core.document import ParsedPage
+from app.core.rules import RuleSet
+from app.core.registry import register_detector
+
+@register_detector("xss")
+def check_xss(
+    url: str, 
+    page: ParsedPage, 
+    headers: Dict[str, str],
+    rules: RuleSet,
+    vulnerabilities: List[Dict[str, Any]]
+) -> None:
+    """检测XSS跨站脚本漏洞"""
+    if "xss" not in rules:
+        return
+    
+    matcher = rules["xss"].matcher
+    severity = rules["xss"].get("severity", "高")
+    
+    # 检查表单中是否有不安全的输入反射
+    for form in page.forms:
+        for input_field in form["inputs"]:
+            # 检查是否对输入进行了适当的过滤
+            if input_field["type"] in ['text', 'search', 'url', 'tel', 'email', None]:
+                vulnerabilities.append({
+                    "type": "xss",
+                    "url": url,
+                    "description": "表单可能存在XSS漏洞",
+                    "severity": severity,
+                    "details": f"表单ID: {form['id'] or '未知'}, 输入字段: {input_field['name'] or '未知'}"
+                })
+                break
+    
+    # 检查URL参数是否反射到页面
+    parsed_url = urlparse(url)
+    if parsed_url.query:
+        query_parts = parsed_url.query.split('&')
+        for part in query_parts:
+            if '=' in part:
+                name, value = part.split('=', 1)
+                if value and matcher.search(value) and value in page.html:
+                    vulnerabilities.append({
+                        "type": "xss",
+                        "url": url,
+                        "description": "URL参数被直接反射到页面",
+                        "severity": severity,
+                        "details": f"参数名: {name}, 值: {value}"
+                    })
@@ -1,13 +1,48 @@
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import json
 import os
 from pathlib import Path
+from app.core.storage import result_store
+from app.core.executor import (
+    configure_analysis_pool, shutdown_executors, loop_monitor, DEFAULT_ANALYSIS_WORKERS
+)
+from app.core.scanner import load_scan_config, DEFAULT_CONCURRENT_SCANS
+from app.core.http import session_manager
+from app.core.jobs import DEFAULT_JOB_LEASE_SECONDS
+from app.core.batches import DEFAULT_MAX_SCANS_PER_HOST
+from app.core.metrics import registry
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用启动时创建页面分析进程池和共享HTTP连接池、启动扫描调度器并开始监测事件循环延迟，
+    关闭时释放
+    """
+    config = load_scan_config()
+    configure_analysis_pool(config.get("analysis_workers", DEFAULT_ANALYSIS_WORKERS))
+    await session_manager.start(config)
+    loop_monitor.start()
+    # embedded_workers为false时API进程只负责入队，扫描由python -m app.worker启动的工作进程执行
+    workers = config.get("concurrent_scans", DEFAULT_CONCURRENT_SCANS) if config.get("embedded_workers", True) else 0
+    await scan.start_scheduler(
+        workers,
+        lease_seconds=config.get("job_lease_seconds", DEFAULT_JOB_LEASE_SECONDS),
+        max_per_origin=config.get("max_scans_per_host", DEFAULT_MAX_SCANS_PER_HOST)
+    )
+    yield
+    await scan.scheduler.stop()
+    await session_manager.close()
+    await loop_monitor.stop()
+    shutdown_executors()
 
 app = FastAPI(
     title="SecureScout API",
     description="Web安全检测工具API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 创建API路由器，添加/api前缀
@@ -29,25 +64,48 @@ def init_data_files():
     
     # 初始化配置文件
     config_file = data_dir / "config.json"
-    if not config_file.exists():
+    if not config_file.exists() or config_file.stat().st_size == 0:
         default_config = {
             "scan_timeout": 30,
+            "fetch_retries": 2,
+            "circuit_breaker_threshold": 5,
+            "circuit_breaker_cooldown": 30,
             "concurrent_scans": 5,
+            "embedded_workers": True,
+            "job_lease_seconds": 30,
+            "max_scans_per_host": 2,
+            "max_pages": 50,
+            "max_query_variants": 10,
+            "scope_include": [],
+            "scope_exclude": [],
+            "ignored_query_params": ["utm_*", "gclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "jsessionid", "phpsessid", "aspsessionid*", "sid", "sessionid"],
+            "html_parser": "auto",
+            "probe_rate_limit": 10,
+            "probe_max_in_flight": 4,
+            "probe_budget_per_origin": 1000,
+            "analysis_workers": 2,
+            "connection_limit": 100,
+            "connection_limit_per_host": 10,
+            "dns_cache_ttl": 300,
+            "keepalive_timeout": 30,
+            "max_response_bytes": 5242880,
+            "fetch_content_types": ["text/", "application/xhtml+xml", "application/xml", "application/json"],
+            "response_cache": False,
+            "response_cache_ttl": 604800,
+            "response_cache_max_bytes": 268435456,
             "user_agent": "SecureScout/1.0",
             "default_scan_modules": ["sql_injection", "xss", "csrf", "file_upload"]
         }
         with open(config_file, "w") as f:
             json.dump(default_config, f, indent=2)
     
-    # 初始化扫描结果文件
-    results_file = data_dir / "scan_results.json"
-    if not results_file.exists():
-        with open(results_file, "w") as f:
-            json.dump([], f)
+    # 初始化扫描结果数据库（首次启动时导入旧版scan_results.json）
+    result_store.init()
     
     # 初始化漏洞库文件
+    # 不存在或为空文件时写入默认漏洞库，内容无效时保留原文件，扫描会报错
     vulns_file = data_dir / "vulnerabilities.json"
-    if not vulns_file.exists():
+    if not vulns_file.exists() or vulns_file.stat().st_size == 0:
         default_vulns = {
             "sql_injection": {
                 "patterns": ["'", "OR 1=1", "' OR '1'='1", "--", "/*"],
@@ -88,4 +146,21 @@ app.include_router(api_router)
 
 @app.get("/")
 async def root():
-    return {"message": "欢迎使用SecureScout Web安全检测工具"} 
\ No newline at end of file
+    return {"message": "欢迎使用SecureScout Web安全检测工具"}
+
+@app.get("/health")
+async def health():
+    """服务健康状态，包含事件循环延迟，用于确认扫描期间API响应不受阻塞"""
+    return {"status": "ok", "event_loop_lag": loop_monitor.snapshot()}
+
+# 事件循环延迟，导出时读取当前值
+registry.gauge(
+    "securescout_event_loop_lag_seconds",
+    "事件循环当前延迟",
+    callback=lambda: {(): loop_monitor.snapshot()["current_ms"] / 1000}
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus格式的运行指标：HTTP请求、页面解析、各检测模块耗时、结果保存耗时和队列深度"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,59 @@
+import asyncio
+import signal
+import logging
+import argparse
+from typing import Optional
+
+from app.core.storage import result_store
+from app.core.executor import configure_analysis_pool, shutdown_executors, DEFAULT_ANALYSIS_WORKERS
+from app.core.scanner import load_scan_config, DEFAULT_CONCURRENT_SCANS
+from app.core.http import session_manager
+from app.core.jobs import DEFAULT_JOB_LEASE_SECONDS, default_worker_id
+from app.core.batches import DEFAULT_MAX_SCANS_PER_HOST
+from app.api import scan
+
+logger = logging.getLogger(__name__)
+
+async def run_worker(slots: Optional[int] = None, worker_id: Optional[str] = None, lease_seconds: Optional[float] = None) -> None:
+    """
+    作为独立工作进程执行扫描任务，收到SIGINT/SIGTERM时把未完成的任务放回队列后退出
+
+    与API进程共用data目录下的扫描结果数据库：从scan_jobs表领取任务，通过心跳续约并上报进度，
+    结果写入同一个数据库，由API进程的状态和报告接口读取
+    """
+    config = load_scan_config()
+    configure_analysis_pool(config.get("analysis_workers", DEFAULT_ANALYSIS_WORKERS))
+    await session_manager.start(config)
+    result_store.init()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await scan.start_scheduler(
+        slots or config.get("concurrent_scans", DEFAULT_CONCURRENT_SCANS),
+        worker_id or default_worker_id(),
+        lease_seconds or config.get("job_lease_seconds", DEFAULT_JOB_LEASE_SECONDS),
+        config.get("max_scans_per_host", DEFAULT_MAX_SCANS_PER_HOST)
+    )
+    try:
+        await stop.wait()
+    finally:
+        logger.info("工作进程正在退出")
+        await scan.scheduler.stop()
+        await session_manager.close()
+        shutdown_executors()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="SecureScout扫描工作进程，需在backend目录下运行，与API进程共用data目录"
+    )
+    parser.add_argument("--slots", type=int, help="同时执行的扫描数，默认使用配置中的concurrent_scans")
+    parser.add_argument("--id", dest="worker_id", help="工作进程ID，默认为主机名:进程号")
+    parser.add_argument("--lease", type=float, help="任务租约时长（秒），默认使用配置中的job_lease_seconds")
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.slots, args.worker_id, args.lease))
+
+if __name__ == "__main__":
+    main()
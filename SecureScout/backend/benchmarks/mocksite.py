@@ -0,0 +1,105 @@
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+from aiohttp import web
+
+# 填充页面大小使用的文本
+FILLER_WORDS = (
+    "security scanner benchmark page content lorem ipsum dolor sit amet "
+    "consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore"
+).split()
+
+class MockSite:
+    """
+    基准测试用的本地目标站点
+
+    页面为/page/{n}，每页包含fanout个指向其他页面的链接、forms个表单（其中一个不带CSRF令牌）
+    和file_inputs个文件上传框。vulnerable_ratio比例的页面带有?id=参数的链接，参数中包含单引号
+    时返回MySQL错误信息，用于SQL注入检测。latency为每个响应的延迟（秒），page_bytes为页面的
+    目标大小。页面内容由seed决定，同一参数生成的站点完全相同。
+    """
+
+    def __init__(
+        self,
+        pages: int = 200,
+        fanout: int = 5,
+        forms: int = 1,
+        file_inputs: int = 1,
+        vulnerable_ratio: float = 0.1,
+        latency: float = 0.0,
+        page_bytes: int = 4096,
+        seed: int = 0
+    ):
+        self.pages = max(1, pages)
+        self.fanout = fanout
+        self.forms = forms
+        self.file_inputs = file_inputs
+        self.latency = latency
+        self.page_bytes = page_bytes
+        rng = random.Random(seed)
+        self.vulnerable = {n for n in range(self.pages) if rng.random() < vulnerable_ratio}
+        self.served_at: Dict[str, float] = {}
+        self.requests = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    def render(self, n: int, query_value: Optional[str] = None) -> str:
+        """生成第n个页面的HTML"""
+        parts = ["<html><head><title>page", str(n), "</title></head><body>"]
+        for i in range(self.fanout):
+            parts.append(f'<a href="/page/{(n * self.fanout + i + 1) % self.pages}">link {i}</a>')
+        if n in self.vulnerable:
+            parts.append(f'<a href="/page/{n}?id=1">item</a>')
+        for i in range(self.forms):
+            token = "" if i == 0 else f'<input type="hidden" name="csrf_token" value="t{n}">'
+            parts.append(
+                f'<form method="post" action="/submit/{n}/{i}">{token}'
+                f'<input type="text" name="q{i}"><input type="submit"></form>'
+            )
+        for i in range(self.file_inputs):
+            parts.append(
+                f'<form method="post" enctype="multipart/form-data" action="/upload/{n}/{i}">'
+                f'<input type="file" name="file{i}"></form>'
+            )
+        if query_value is not None and "'" in query_value and n in self.vulnerable:
+            parts.append("<p>You have an error in your SQL syntax; check the manual that "
+                         "corresponds to your MySQL server version</p>")
+
+        html = "".join(parts)
+        if len(html) < self.page_bytes:
+            rng = random.Random(n)
+            filler = []
+            size = len(html)
+            while size < self.page_bytes:
+                word = rng.choice(FILLER_WORDS)
+                filler.append(word)
+                size += len(word) + 1
+            html += "<p>" + " ".join(filler) + "</p>"
+        return html + "</body></html>"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        n = int(request.match_info.get("n", 0)) % self.pages
+        self.served_at[request.path_qs] = time.perf_counter()
+        return web.Response(text=self.render(n, request.query.get("id")), content_type="text/html")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """启动站点并返回首页URL，port为0时使用随机端口"""
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        app.router.add_get("/page/{n}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url + "/"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,376 @@
+"""
+SecureScout基准测试
+
+在backend目录下运行：
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --scenarios scan,detectors --pages 500 --compare bench.json
+
+测试在临时工作目录中进行（使用默认配置和漏洞库），不会影响data目录。结果以JSON输出，
+包含每个场景的吞吐量（pages_per_sec/ops_per_sec）、p50/p99延迟（毫秒）、每页CPU时间和进程峰值RSS；
+使用--compare时会与之前的结果对比并输出变化比例。模拟站点与扫描器运行在同一进程中，CPU时间包含站点的开销；
+页面分析默认在线程池中执行，指定--analysis-workers后分析进程的CPU时间不计入。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.mocksite import MockSite
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = ["scan", "extract_links", "detectors", "reports"]
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def timed_loop(func: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    """重复执行同步函数，返回吞吐量和单次延迟"""
+    latencies = []
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "iterations": iterations,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(iterations / elapsed, 1) if elapsed else None,
+        **latency_stats(latencies),
+        "cpu_per_op_ms": round((time.process_time() - cpu_start) * 1000 / iterations, 4)
+    }
+
+async def timed_async_loop(func: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    """重复执行协程函数，返回吞吐量和单次延迟"""
+    latencies = []
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "iterations": iterations,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(iterations / elapsed, 1) if elapsed else None,
+        **latency_stats(latencies),
+        "cpu_per_op_ms": round((time.process_time() - cpu_start) * 1000 / iterations, 4)
+    }
+
+def new_site(args: argparse.Namespace) -> MockSite:
+    return MockSite(
+        pages=args.pages,
+        fanout=args.fanout,
+        forms=args.forms,
+        file_inputs=args.file_inputs,
+        vulnerable_ratio=args.vulnerable_ratio,
+        latency=args.latency,
+        page_bytes=args.page_bytes,
+        seed=args.seed
+    )
+
+async def bench_scan(args: argparse.Namespace) -> Dict[str, Any]:
+    """完整扫描：爬行模拟站点并执行所有检测模块"""
+    from urllib.parse import urlsplit
+    from app.core.scanner import scan_url_for_vulnerabilities
+
+    site = new_site(args)
+    start_url = await site.start()
+    page_latencies: List[float] = []
+
+    def on_progress(event: str, data: Dict[str, Any]) -> None:
+        # 页面延迟：模拟站点返回该页面到扫描器完成该页面分析和探测的时间
+        if event == "page":
+            parts = urlsplit(data["url"])
+            path = parts.path + (f"?{parts.query}" if parts.query else "")
+            served = site.served_at.get(path)
+            if served is not None:
+                page_latencies.append(time.perf_counter() - served)
+
+    try:
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        findings = await scan_url_for_vulnerabilities(
+            start_url, depth=args.depth, max_pages=args.pages, progress=on_progress
+        )
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+    finally:
+        await site.stop()
+
+    pages = len(page_latencies)
+    return {
+        "pages": pages,
+        "requests": site.requests,
+        "findings": len(findings),
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed else None,
+        **latency_stats(page_latencies),
+        "cpu_per_page_ms": round(cpu * 1000 / pages, 3) if pages else None
+    }
+
+async def bench_extract_links(args: argparse.Namespace) -> Dict[str, Any]:
+    """链接提取：字符串输入（含解析）和已解析页面两种方式"""
+    from app.core.document import ParsedPage
+    from app.core.scanner import extract_links
+
+    site = new_site(args)
+    url = "http://127.0.0.1/page/1"
+    html = site.render(1)
+    page = ParsedPage(url, html)
+    return {
+        "page_bytes": len(html),
+        "from_html": timed_loop(lambda: extract_links(url, html), args.iterations),
+        "from_parsed_page": timed_loop(lambda: extract_links(url, page), args.iterations)
+    }
+
+async def bench_detectors(args: argparse.Namespace) -> Dict[str, Any]:
+    """逐个检测模块：页面检测使用已解析页面，探测类检测请求模拟站点的注入点"""
+    from app.core.document import ParsedPage
+    from app.core.registry import list_detectors, PAGE_DETECTOR
+    from app.core.rules import compile_rules
+    from app.core.http import session_manager
+    from app.core.scanner import load_vulnerability_library, load_scan_config
+
+    rules = compile_rules(load_vulnerability_library())
+    site = new_site(args)
+    await site.start()
+    n = min(site.vulnerable) if site.vulnerable else 0
+    page_url = f"{site.base_url}/page/{n}"
+    html = site.render(n)
+    page = ParsedPage(page_url, html)
+    headers = {"Content-Type": "text/html"}
+    results: Dict[str, Any] = {}
+
+    try:
+        async with session_manager.scan_session(None, load_scan_config()) as session:
+            for detector in list_detectors():
+                if detector.kind == PAGE_DETECTOR:
+                    results[detector.name] = timed_loop(
+                        lambda: detector.func(page_url, page, headers, rules, []), args.iterations
+                    )
+                else:
+                    probe_url = f"{page_url}?id=1"
+                    iterations = max(1, args.iterations // 10)
+
+                    async def run_probe() -> None:
+                        # 每次使用新的会话缓存，包含基准请求
+                        session.cache.clear()
+                        await detector.func(session, probe_url, rules, [])
+
+                    results[detector.name] = await timed_async_loop(run_probe, iterations)
+    finally:
+        await site.stop()
+    return results
+
+async def bench_reports(args: argparse.Namespace) -> Dict[str, Any]:
+    """报告接口：在写入reports条扫描结果的库上调用分页列表、详情、摘要和统计接口"""
+    from datetime import timedelta
+    from app.core.executor import run_blocking
+    from app.core.storage import result_store
+    from app.api import report
+
+    now = datetime.now()
+    statuses = ["completed", "completed", "completed", "failed"]
+    types = [("sql_injection", "高"), ("xss", "高"), ("csrf", "中"), ("file_upload", "严重")]
+    write_start = time.perf_counter()
+    for i in range(args.reports):
+        await run_blocking(result_store.save, {
+            "id": f"bench-{i}",
+            "url": f"http://example.com/{i}",
+            "status": statuses[i % len(statuses)],
+            "start_time": (now - timedelta(minutes=i * 7)).isoformat(),
+            "end_time": (now - timedelta(minutes=i * 7 - 1)).isoformat(),
+            "vulnerabilities": [
+                {"type": vuln_type, "severity": severity, "url": f"http://example.com/{i}"}
+                for vuln_type, severity in types[: i % (len(types) + 1)]
+            ]
+        })
+    write_seconds = time.perf_counter() - write_start
+
+    iterations = args.iterations
+    results: Dict[str, Any] = {
+        "reports": args.reports,
+        "save_per_sec": round(args.reports / write_seconds, 1) if write_seconds else None,
+        "list_first_page": await timed_async_loop(lambda: report.get_all_reports(limit=50), iterations),
+        "list_deep_offset": await timed_async_loop(
+            lambda: report.get_all_reports(limit=50, offset=max(0, args.reports - 50)), iterations
+        ),
+        "get_report": await timed_async_loop(lambda: report.get_report(f"bench-{args.reports // 2}"), iterations),
+        "summary_recent": await timed_async_loop(lambda: report.get_recent_summary(7), iterations),
+        "vulnerability_types": await timed_async_loop(report.get_vulnerability_types_stats, iterations)
+    }
+
+    # 游标翻页遍历全部结果
+    async def walk_cursor() -> None:
+        cursor = None
+        while True:
+            page = await report.get_all_reports(limit=200, cursor=cursor)
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+    results["cursor_walk_all"] = await timed_async_loop(walk_cursor, max(1, iterations // 10))
+    return results
+
+BENCHMARKS = {
+    "scan": bench_scan,
+    "extract_links": bench_extract_links,
+    "detectors": bench_detectors,
+    "reports": bench_reports
+}
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any], prefix: str = "") -> List[str]:
+    """逐项比较两次结果中的数值指标，返回变化描述"""
+    lines = []
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            lines.extend(compare(old or {}, value, name + "."))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            lines.append(f"{name}: {old} -> {value} ({(value - old) / old * 100:+.1f}%)")
+    return lines
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.core.executor import configure_analysis_pool, shutdown_executors
+    from app.core.http import session_manager
+    from app.core.settings import config_cache
+    from app.main import init_data_files
+
+    init_data_files()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    config = config_cache.copy()
+    config.update({
+        "concurrent_scans": args.workers,
+        "probe_rate_limit": args.probe_rate_limit,
+        "analysis_workers": args.analysis_workers
+    })
+    config_cache.write(config)
+    configure_analysis_pool(args.analysis_workers)
+    await session_manager.start(config)
+
+    scenarios: Dict[str, Any] = {}
+    try:
+        for name in args.scenarios:
+            print(f"running {name} ...", file=sys.stderr)
+            result = await BENCHMARKS[name](args)
+            result["peak_rss_mb"] = peak_rss_mb()
+            scenarios[name] = result
+    finally:
+        await session_manager.close()
+        shutdown_executors()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                key: value for key, value in vars(args).items()
+                if key not in ("output", "compare", "verbose")
+            }
+        },
+        "scenarios": scenarios
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SecureScout基准测试")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"逗号分隔的场景列表，可选: {', '.join(SCENARIOS)}")
+    parser.add_argument("--pages", type=int, default=200, help="模拟站点页面数，也是扫描的最大页面数")
+    parser.add_argument("--fanout", type=int, default=5, help="每页链接数")
+    parser.add_argument("--forms", type=int, default=1, help="每页表单数")
+    parser.add_argument("--file-inputs", type=int, default=1, help="每页文件上传框数")
+    parser.add_argument("--vulnerable-ratio", type=float, default=0.1, help="带SQL注入点的页面比例")
+    parser.add_argument("--latency", type=float, default=0.005, help="模拟站点响应延迟（秒）")
+    parser.add_argument("--page-bytes", type=int, default=8192, help="页面大小（字节）")
+    parser.add_argument("--depth", type=int, default=10, help="扫描爬行层数")
+    parser.add_argument("--workers", type=int, default=5, help="爬虫并发数（concurrent_scans）")
+    parser.add_argument("--analysis-workers", type=int, default=0, help="页面分析进程数，0为线程池")
+    parser.add_argument("--probe-rate-limit", type=float, default=1000, help="每个主机每秒最多探测请求数")
+    parser.add_argument("--iterations", type=int, default=200, help="微基准的迭代次数")
+    parser.add_argument("--reports", type=int, default=2000, help="报告场景写入的扫描结果数")
+    parser.add_argument("--seed", type=int, default=0, help="模拟站点随机种子")
+    parser.add_argument("--verbose", action="store_true", help="输出扫描日志")
+    parser.add_argument("--output", help="结果JSON文件，未指定时输出到标准输出")
+    parser.add_argument("--compare", help="与之前的结果JSON文件比较")
+    args = parser.parse_args(argv)
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    output = Path(args.output).resolve() if args.output else None
+    previous_file = Path(args.compare).resolve() if args.compare else None
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="securescout-bench-") as workdir:
+        # 应用使用相对于工作目录的data/，在临时目录中运行以隔离基准数据
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(run_benchmarks(args))
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        output.write_text(text + "\n")
+    else:
+        print(text)
+
+    if previous_file:
+        previous = json.loads(previous_file.read_text())
+        for line in compare(previous.get("scenarios", {}), results["scenarios"]):
+            print(line, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 import uvicorn
 import os
+import argparse
 from pathlib import Path
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动SecureScout后端API服务")
+    # 自动重载会在代码变化时重启进程，中断正在执行的扫描并留下未释放的任务租约，只用于本地开发
+    parser.add_argument("--reload", action="store_true", help="代码变化时自动重启服务，仅用于开发")
+    args = parser.parse_args()
+    
     # 确保在正确的工作目录中运行
     backend_dir = Path(__file__).parent
     os.chdir(backend_dir)
@@ -16,5 +22,5 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=args.reload
     ) 
\ No newline at end of file
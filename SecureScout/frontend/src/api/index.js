@@ -38,6 +38,26 @@ export const scanApi = {
   // 获取所有活动扫描
   getActiveScans() {
     return api.get('/api/scan/active')
+  },
+  
+  // 取消排队中或正在进行的扫描
+  cancelScan(scanId) {
+    return api.delete(`/api/scan/${scanId}`)
+  },
+  
+  // 订阅扫描进度事件（SSE），返回EventSource，调用close()取消订阅
+  subscribeScanEvents(scanId, onEvent) {
+    const source = new EventSource(`/api/scan/events/${scanId}`)
+    const eventTypes = ['status', 'page', 'finding', 'gap', 'partial', 'end']
+    eventTypes.forEach(type => {
+      source.addEventListener(type, event => {
+        onEvent(type, JSON.parse(event.data))
+        if (type === 'end') {
+          source.close()
+        }
+      })
+    })
+    return source
   }
 }
 